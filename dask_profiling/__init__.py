@@ -7,9 +7,12 @@ See also for a short description of docstring:
 https://stackoverflow.com/questions/3898572/what-is-the-standard-python-docstring-format
 """
 import codecs
+import gzip
+import os
 import dask_profiling.templates as templates
 from dask_profiling.describe import describe as describe_df
-from dask_profiling.report import to_html
+from dask_profiling.report import to_html, generate_html, AssetDirectory
+from dask_profiling.state import ProfileState
 
 
 NO_OUTPUTFILE = "dask_profiling.no_outputfile"
@@ -37,16 +40,84 @@ class ProfileReport(object):
         Variable names not to be rejected because they are correlated.
         There is no variable in the list (`None`) by default.
     check_recoded : boolean
-        Whether or not to check recoded correlation (memory heavy feature).
-        Since it's an expensive computation it can be activated for small datasets.
-        `check_correlation` must be true to disable this check.
+        Whether or not to check recoded correlation, that is categorical variables having a
+        one-to-one mapping between their values (see `accumulators.RowGroups`). It is computed
+        in the same pass, the memory grows with the number of distinct values of the variables.
+        `check_correlation` must be true to enable this check.
         It's `False` by default.
     pool_size : int
-        Number of workers in thread pool
+        Number of processes rendering the plots.
         The default is equal to the number of CPU.
+    quantile_sketch : boolean
+        Whether or not to compute the percentiles with a mergeable quantile sketch (t-digest).
+        It's `False` by default.
+    quantile_compression : int
+        Accuracy of the quantile sketch, the rank error is about `1 / quantile_compression`.
+        The default is 100.
+    approx_distinct : boolean
+        Whether or not to estimate the distinct counts with a HyperLogLog sketch instead of value counts.
+        It only applies with `top_k`, otherwise all the values are counted and so are the distinct ones.
+        It's `True` by default.
+    top_k : int
+        Number of values kept in the frequency tables, estimated with a heavy hitters sketch.
+        The default (`None`) keeps the exact counts of all values.
+    partition_cache : PartitionCache
+        On-disk cache of the summaries of the partitions, to profile again a dataset
+        after some of its partitions changed (see `dask_profiling.base.PartitionCache`).
+        The percentiles, mean absolute deviations and histograms are then estimated from a t-digest.
+        There is no cache (`None`) by default.
+    parquet_path : str or list
+        The files of the dataset if it was read by `dd.read_parquet`, the extrema found in
+        their footers let the histograms be computed in the same pass (pyarrow is needed).
+        The default is `None`.
+    sample_fraction : float
+        Fraction of the partitions profiled, drawn at random. The proportions and moments
+        then come with confidence intervals. All the partitions are profiled (`None`) by default.
+    max_rows : int
+        Maximum number of rows profiled, sampled uniformly inside the profiled partitions.
+        There is no maximum (`None`) by default.
+    random_state : int
+        Seed of the sampling, drawn at random (`None`) by default.
+    confidence : float
+        Confidence level of the intervals given when the data is sampled.
+        The default is 0.95.
+    time_budget : float
+        Time budget in seconds, the partitions are summarized in random order until it runs out
+        and the report shows the fraction of the data covered. It can not be combined with `check_recoded`,
+        `parquet_path`, `spearman`, `kendall_rows` or `cramers_v`. There is no budget (`None`) by default.
+    spearman : boolean
+        Whether or not to compute the Spearman correlations, from ranks estimated by quantile sketches.
+        It's `False` by default.
+    kendall_rows : int
+        Number of rows sampled to compute the Kendall correlations, not computed (`None`) by default.
+    cramers_v : boolean
+        Whether or not to compute the association matrix (Cramér's V) of the categorical variables.
+        It's `False` by default.
+    cramers_levels : int
+        Number of values per categorical variable in the contingency tables. The default is 20.
+    approx_duplicates : boolean
+        Whether or not to estimate the number of duplicate rows with a HyperLogLog sketch
+        of the hashes of the rows. It's `False` by default.
+    renderer : str
+        How the plots are drawn: 'png' images rendered by matplotlib, or 'svg' markup
+        embedded in the report, drawn from the bin counts without matplotlib.
+        The default is 'png'.
+    incremental : boolean
+        Whether or not to keep the mergeable state of the profile (see `ProfileState`),
+        so that the report can be updated with new data by `update`. The percentiles,
+        mean absolute deviations and histograms are then estimated from a t-digest.
+        Only the options which a state can merge are supported (see `state.OPTIONS`),
+        the others, like `sample_fraction`, `time_budget` or `spearman`, raise a ValueError.
+        It's `False` by default.
+    state : ProfileState
+        The mergeable state of the profile, `None` if the report is not `incremental`.
 
     Methods
     -------
+    from_state
+        Build the report of a `ProfileState`.
+    update
+        Add new data to the report, only the new data is read.
     get_description
         Return the description (a raw statistical summary) of the dataset.
     get_rejected_variables
@@ -56,21 +127,74 @@ class ProfileReport(object):
     to_html
         Return the report as an HTML string.
     """
-    html = ''
     file = None
+    state = None
+    _html = None
 
     def __init__(self, df, **kwargs):
         """Constructor see class documentation
         """
-        sample = kwargs.get('sample', df.head())
+        sample = kwargs.pop('sample', None)
+        if sample is None:
+            sample = df.head()
 
-        description_set = describe_df(df, **kwargs)
-
-        self.html = to_html(sample,
-                            description_set)
+        if kwargs.pop('incremental', False):
+            self.state = ProfileState.from_dataframe(df, **kwargs)
+            description_set = self.state.describe()
+        else:
+            description_set = describe_df(df, **kwargs)
 
+        self.sample = sample
         self.description_set = description_set
 
+    @classmethod
+    def from_state(cls, state, sample):
+        """Build the report of a profile state.
+
+        Parameters
+        ----------
+        state : ProfileState
+            The state of the profile, for example read with `ProfileState.load`.
+        sample : DataFrame
+            The sample of the data shown in the report (pandas).
+
+        Returns
+        -------
+        ProfileReport
+            The report.
+        """
+        report = cls.__new__(cls)
+        report.state = state
+        report.sample = sample
+        report.description_set = state.describe()
+        return report
+
+    def update(self, df):
+        """Add new data to the report, only the new data is read.
+
+        Parameters
+        ----------
+        df : DataFrame
+            The new data, with the same variables.
+
+        Raises
+        ------
+        ValueError
+            If the report is not `incremental`.
+        """
+        if self.state is None:
+            raise ValueError("Only an incremental report can be updated")
+        self.state.update(df)
+        self.description_set = self.state.describe()
+        self._html = None
+
+    @property
+    def html(self):
+        """The report in HTML format (without the page around it), rendered on first use."""
+        if self._html is None:
+            self._html = to_html(self.sample, self.description_set)
+        return self._html
+
     def get_description(self):
         """Return the description (a raw statistical summary) of the dataset.
 
@@ -104,23 +228,43 @@ class ProfileReport(object):
             result = variable_profile.index[variable_profile.correlation > threshold].tolist()
         return  result
 
-    def to_file(self, outputfile=DEFAULT_OUTPUTFILE):
+    def to_file(self, outputfile=DEFAULT_OUTPUTFILE, assets_dir=None, compress=False):
         """Write the report to a file.
         
-        By default a name is generated.
+        By default a name is generated. Each variable is written as soon as it is
+        rendered, so the memory does not grow with the size of the report.
 
         Parameters:
         ----------
         outputfile : str
             The name or the path of the file to generale including the extension (.html).
+        assets_dir : str
+            Directory where the images are written, once per content (see `report.AssetDirectory`),
+            the report then loads them lazily. They are embedded in the report (`None`) by default.
+        compress : boolean
+            Whether or not to compress the report with gzip, the extension is not changed.
+            It's `False` by default.
         """
     
         if outputfile != NO_OUTPUTFILE:
             if outputfile == DEFAULT_OUTPUTFILE:
                 outputfile = 'profile_' + str(hash(self)) + ".html"
-            # TODO: should be done in the template
-            with codecs.open(outputfile, 'w+b', encoding='utf8') as self.file:
-                self.file.write(templates.template('wrapper').render(content=self.html))
+            if assets_dir is not None:
+                # The images are referred to relatively to the report
+                url = os.path.relpath(assets_dir, os.path.dirname(os.path.abspath(outputfile)))
+                content = generate_html(self.sample, self.description_set, AssetDirectory(assets_dir, url))
+            elif self._html is not None:
+                content = [self._html]
+            else:
+                # The report is written as it is rendered
+                content = generate_html(self.sample, self.description_set)
+            if compress:
+                self.file = gzip.open(outputfile, 'wt', encoding='utf8')
+            else:
+                self.file = codecs.open(outputfile, 'w+b', encoding='utf8')
+            with self.file:
+                for chunk in templates.template('wrapper').generate(content=content):
+                    self.file.write(chunk)
 
     def to_html(self):
         """Generate and return complete template as lengthy string
@@ -131,7 +275,7 @@ class ProfileReport(object):
         str
             The HTML output.
         """
-        return templates.template('wrapper').render(content=self.html)
+        return templates.template('wrapper').render(content=[self.html])
 
     def _repr_html_(self):
         """Used to output the HTML representation to a Jupyter notebook
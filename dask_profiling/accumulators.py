@@ -0,0 +1,1213 @@
+# -*- coding: utf-8 -*-
+"""Mergeable per-partition summaries used to compute statistics in a single pass.
+
+Each accumulator is built from one pandas partition with `from_series` and
+two accumulators are combined with `merge`. `reduce_partitions` applies them
+to a dask Series as a tree reduction, so every partition is scanned once and
+only the small summaries travel between workers.
+"""
+import numpy as np
+import pandas as pd
+from dask import delayed, is_dask_collection
+from dask.base import normalize_token
+from dask.array.percentile import merge_percentiles
+
+SPLIT_EVERY = 8
+"""int: Number of accumulators merged together at each level of the tree reduction"""
+
+
+class Accumulator(object):
+    """Base class of the mergeable summaries.
+
+    Subclasses implement `from_series` to summarize a pandas partition and
+    `merge` to combine two summaries. Merging must be associative so that the
+    result does not depend on the partitioning or on the shape of the tree.
+    """
+
+    @classmethod
+    def from_series(cls, series, **kwargs):
+        """Summarize a pandas Series (one partition of the dask Series)."""
+        raise NotImplementedError()
+
+    def merge(self, other):
+        """Combine the summary with another one of the same type.
+
+        Parameters
+        ----------
+        other : Accumulator
+            The summary to merge.
+
+        Returns
+        -------
+        Accumulator
+            A new summary covering both inputs.
+        """
+        raise NotImplementedError()
+
+    def __dask_tokenize__(self):
+        # Deterministic, so that the collections built from computed summaries are cached
+        return type(self).__name__, normalize_token(self.__dict__)
+
+
+class Unsupported(Accumulator):
+    """Placeholder for a summary which could not be computed because of the type of the data.
+
+    It absorbs any summary it is merged with.
+
+    Attributes
+    ----------
+    reason : str
+        The error message.
+    """
+
+    def __init__(self, reason=''):
+        self.reason = reason
+
+    def merge(self, other):
+        return self
+
+
+def summarize(accumulator, series, **kwargs):
+    """Summarize a partition, or return `Unsupported` if its type is not supported (`TypeError`)."""
+    try:
+        return accumulator.from_series(series, **kwargs)
+    except TypeError as e:
+        return Unsupported(str(e))
+
+
+def merge_all(accumulators):
+    """Merge a list of accumulators from left to right.
+
+    Parameters
+    ----------
+    accumulators : list
+        A non empty list of accumulators of the same type.
+
+    Returns
+    -------
+    Accumulator
+        The merged accumulator, `Unsupported` if one of them is or if they can't be merged (`TypeError`).
+    """
+    for accumulator in accumulators:
+        if isinstance(accumulator, Unsupported):
+            return accumulator
+    result = accumulators[0]
+    for accumulator in accumulators[1:]:
+        try:
+            result = result.merge(accumulator)
+        except TypeError as e:
+            return Unsupported(str(e))
+    return result
+
+
+def reduce_partitions(series, accumulator, split_every=SPLIT_EVERY, partition_cache=None, **kwargs):
+    """Summarize a dask Series with an accumulator using a tree reduction.
+
+    The graph is not optimized, so the partitions are shared by all the
+    summaries computed together (the data is read once).
+
+    Parameters
+    ----------
+    series : Series or DataFrame
+        The dask collection to summarize.
+    accumulator : type
+        The `Accumulator` subclass to use.
+    split_every : int
+        Number of accumulators merged by each task of the tree.
+    partition_cache : PartitionCache
+        Where the summaries of the partitions are stored and looked up, see `base.PartitionCache`.
+        Only used if none of the `kwargs` is lazy.
+    kwargs
+        Passed to `accumulator.from_series`, they can be `Delayed` objects.
+
+    Returns
+    -------
+    Delayed
+        The merged accumulator, `Unsupported` if the type of the data is not supported.
+        It is the computed accumulator if all the partitions are cached.
+    """
+    if any(is_dask_collection(value) for value in kwargs.values()):
+        partition_cache = None
+    parts = []
+    for i, part in enumerate(series.to_delayed(optimize_graph=False)):
+        summary = None
+        if partition_cache is not None:
+            key = partition_cache.key(series, i, part, accumulator, kwargs)
+            summary = partition_cache.load(key)
+        if summary is None:
+            summary = delayed(summarize, pure=True)(accumulator, part, **kwargs)
+            if partition_cache is not None:
+                summary = delayed(partition_cache.save, pure=True)(key, summary)
+        parts.append(summary)
+    if all(not is_dask_collection(part) for part in parts):
+        return merge_all(parts)
+    while len(parts) > 1:
+        parts = [delayed(merge_all, pure=True)(parts[i:i + split_every]) for i in range(0, len(parts), split_every)]
+    return parts[0]
+
+
+def _non_missing_values(series):
+    """Return the non-NaN values of a Series as a float array."""
+    return series.dropna().values.astype(np.float64)
+
+
+class Counts(Accumulator):
+    """Number of observations, non-missing observations and memory of a variable.
+
+    Attributes
+    ----------
+    size : int
+        Number of observations, including missing values.
+    count : int
+        Number of non-missing observations.
+    memory : int
+        Memory usage in bytes, index included.
+    first : object
+        The first observation, `None` if there is none.
+    """
+
+    def __init__(self, size=0, count=0, memory=0, first=None):
+        self.size = size
+        self.count = count
+        self.memory = memory
+        self.first = first
+
+    @classmethod
+    def from_series(cls, series, **kwargs):
+        return cls(len(series), int(series.count()), int(series.memory_usage(index=True)),
+                   series.iloc[0] if len(series) > 0 else None)
+
+    def merge(self, other):
+        return Counts(self.size + other.size, self.count + other.count, self.memory + other.memory,
+                      self.first if self.size > 0 else other.first)
+
+
+class Extremes(Accumulator):
+    """Minimum and maximum of a variable, in its own type (dates are kept as timestamps).
+
+    Attributes
+    ----------
+    minimum : object
+        The smallest non-missing value, missing if there is none.
+    maximum : object
+        The largest non-missing value, missing if there is none.
+    """
+
+    def __init__(self, minimum=np.nan, maximum=np.nan):
+        self.minimum = minimum
+        self.maximum = maximum
+
+    @classmethod
+    def from_series(cls, series, **kwargs):
+        return cls(series.min(), series.max())
+
+    def merge(self, other):
+        minimum = self.minimum if pd.isnull(other.minimum) or other.minimum > self.minimum else other.minimum
+        maximum = self.maximum if pd.isnull(other.maximum) or other.maximum < self.maximum else other.maximum
+        return Extremes(minimum, maximum)
+
+
+class TableCounts(Accumulator):
+    """Number of rows and memory usage of a DataFrame.
+
+    Attributes
+    ----------
+    size : int
+        Number of rows.
+    memory : int
+        Memory usage in bytes, index included.
+    """
+
+    def __init__(self, size=0, memory=0):
+        self.size = size
+        self.memory = memory
+
+    @classmethod
+    def from_series(cls, series, **kwargs):
+        return cls(len(series), int(series.memory_usage(index=True).sum()))
+
+    def merge(self, other):
+        return TableCounts(self.size + other.size, self.memory + other.memory)
+
+
+def _zero_out_fperr(value):
+    """Round the floating point noise to 0, as pandas does for the higher moments."""
+    return 0.0 if np.abs(value) < 1e-14 else value
+
+
+class Moments(Accumulator):
+    """Count, sum, extrema and central moments up to the fourth order.
+
+    The moments are merged with the pairwise update formulas of Chan et al.
+    and Pébay, which are exact (up to rounding) whatever the partitioning.
+    The derived statistics follow the pandas conventions (unbiased variance,
+    skewness and kurtosis).
+
+    Attributes
+    ----------
+    size : int
+        Number of observations, including missing values.
+    n : int
+        Number of non-missing observations.
+    total : float
+        Sum of the observations.
+    mu : float
+        Mean of the observations.
+    m2, m3, m4 : float
+        Sums of the powers of the deviations from the mean.
+    minimum, maximum : float
+        Extrema of the observations.
+    n_zeros : int
+        Number of observations equal to zero.
+    n_infinite : int
+        Number of infinite observations.
+    finite_minimum, finite_maximum : float
+        Extrema of the finite observations, the range of the histograms.
+    """
+
+    def __init__(self, size=0, n=0, total=0.0, mu=0.0, m2=0.0, m3=0.0, m4=0.0,
+                 minimum=np.nan, maximum=np.nan, n_zeros=0, n_infinite=0,
+                 finite_minimum=np.nan, finite_maximum=np.nan):
+        self.size = size
+        self.n = n
+        self.total = total
+        self.mu = mu
+        self.m2 = m2
+        self.m3 = m3
+        self.m4 = m4
+        self.minimum = minimum
+        self.maximum = maximum
+        self.n_zeros = n_zeros
+        self.n_infinite = n_infinite
+        self.finite_minimum = finite_minimum
+        self.finite_maximum = finite_maximum
+
+    @classmethod
+    def from_series(cls, series, **kwargs):
+        values = _non_missing_values(series)
+        if len(values) == 0:
+            return cls(size=len(series))
+        finite = values[np.isfinite(values)]
+
+        mu = values.mean()
+        deviations = values - mu
+        squares = deviations ** 2
+        return cls(size=len(series),
+                   n=len(values),
+                   total=values.sum(),
+                   mu=mu,
+                   m2=squares.sum(),
+                   m3=(squares * deviations).sum(),
+                   m4=(squares ** 2).sum(),
+                   minimum=values.min(),
+                   maximum=values.max(),
+                   n_zeros=int(np.count_nonzero(values == 0)),
+                   n_infinite=int(np.count_nonzero(np.isinf(values))),
+                   finite_minimum=finite.min() if len(finite) > 0 else np.nan,
+                   finite_maximum=finite.max() if len(finite) > 0 else np.nan)
+
+    def merge(self, other):
+        if other.n == 0 or self.n == 0:
+            result = other if self.n == 0 else self
+            return Moments(self.size + other.size, result.n, result.total, result.mu,
+                           result.m2, result.m3, result.m4, result.minimum, result.maximum,
+                           result.n_zeros, result.n_infinite, result.finite_minimum, result.finite_maximum)
+
+        # The missing finite extrema (only infinite values) are ignored
+        finite_minimum = np.fmin(self.finite_minimum, other.finite_minimum)
+        finite_maximum = np.fmax(self.finite_maximum, other.finite_maximum)
+
+        na, nb = float(self.n), float(other.n)
+        n = na + nb
+        delta = other.mu - self.mu
+        if not np.isfinite(delta):
+            # Infinite values: the mean is the one of the sum (inf, or nan for inf - inf), the moments are undefined
+            return Moments(self.size + other.size, self.n + other.n, self.total + other.total,
+                           (self.total + other.total) / n, np.nan, np.nan, np.nan,
+                           min(self.minimum, other.minimum), max(self.maximum, other.maximum),
+                           self.n_zeros + other.n_zeros, self.n_infinite + other.n_infinite,
+                           finite_minimum, finite_maximum)
+        delta_n = delta / n
+
+        m2 = self.m2 + other.m2 + delta * delta_n * na * nb
+        m3 = (self.m3 + other.m3
+              + delta * delta_n ** 2 * na * nb * (na - nb)
+              + 3.0 * delta_n * (na * other.m2 - nb * self.m2))
+        m4 = (self.m4 + other.m4
+              + delta * delta_n ** 3 * na * nb * (na * na - na * nb + nb * nb)
+              + 6.0 * delta_n ** 2 * (na * na * other.m2 + nb * nb * self.m2)
+              + 4.0 * delta_n * (na * other.m3 - nb * self.m3))
+
+        return Moments(size=self.size + other.size,
+                       n=self.n + other.n,
+                       total=self.total + other.total,
+                       mu=self.mu + delta_n * nb,
+                       m2=m2,
+                       m3=m3,
+                       m4=m4,
+                       minimum=min(self.minimum, other.minimum),
+                       maximum=max(self.maximum, other.maximum),
+                       n_zeros=self.n_zeros + other.n_zeros,
+                       n_infinite=self.n_infinite + other.n_infinite,
+                       finite_minimum=finite_minimum,
+                       finite_maximum=finite_maximum)
+
+    @property
+    def mean(self):
+        return self.mu if self.n > 0 else np.nan
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else np.nan
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    @property
+    def skewness(self):
+        # Same estimator as pandas.Series.skew
+        if self.n < 3:
+            return np.nan
+        n = float(self.n)
+        m2, m3 = _zero_out_fperr(self.m2), _zero_out_fperr(self.m3)
+        if m2 == 0:
+            return 0.0
+        return np.sqrt(n * (n - 1)) / (n - 2) * (m3 / n) / (m2 / n) ** 1.5
+
+    @property
+    def kurtosis(self):
+        # Same estimator as pandas.Series.kurt
+        if self.n < 4:
+            return np.nan
+        n = float(self.n)
+        m2, m4 = _zero_out_fperr(self.m2), _zero_out_fperr(self.m4)
+        denominator = (n - 2) * (n - 3) * m2 ** 2
+        if denominator == 0:
+            return 0.0
+        adjustment = 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+        return n * (n + 1) * (n - 1) * m4 / denominator - adjustment
+
+
+class AbsoluteDeviation(Accumulator):
+    """Sum of the absolute deviations from a given center.
+
+    Used for the mean absolute deviation, the center being the mean computed
+    beforehand by `Moments`.
+    """
+
+    def __init__(self, n=0, total=0.0):
+        self.n = n
+        self.total = total
+
+    @classmethod
+    def from_series(cls, series, center=0.0, **kwargs):
+        values = _non_missing_values(series)
+        return cls(len(values), np.abs(values - center).sum())
+
+    def merge(self, other):
+        return AbsoluteDeviation(self.n + other.n, self.total + other.total)
+
+    @property
+    def mean(self):
+        return self.total / self.n if self.n > 0 else np.nan
+
+
+def histogram_edges(minimum, maximum, bins=10):
+    """Compute the edges of a histogram from the extrema of the data.
+
+    Parameters
+    ----------
+    minimum, maximum : float or Timestamp
+        The finite extrema of the data, usually coming from `Moments`.
+    bins : int
+        Number of bins.
+
+    Returns
+    -------
+    ndarray
+        The `bins + 1` edges, as int64 nanoseconds for dates.
+    """
+    if isinstance(minimum, pd.Timestamp) and isinstance(maximum, pd.Timestamp):
+        minimum, maximum = minimum.value, maximum.value
+    elif pd.isnull(minimum) or pd.isnull(maximum) or not np.isfinite([minimum, maximum]).all():
+        # No finite bounds, the range is only used to draw an empty plot
+        minimum, maximum = 0.0, 1.0
+    return np.histogram_bin_edges(np.empty(0), bins=bins, range=(minimum, maximum))
+
+
+class Histogram(Accumulator):
+    """Bin counts of the data for fixed edges.
+
+    The edges are known beforehand (see `histogram_edges`) so the counts of
+    the partitions only have to be added. Dates are binned on their int64
+    representation.
+
+    Attributes
+    ----------
+    counts : ndarray
+        The number of observations in each bin.
+    edges : ndarray
+        The edges of the bins.
+    is_date : bool
+        Whether the data are dates.
+    """
+
+    def __init__(self, counts, edges, is_date=False):
+        self.counts = counts
+        self.edges = edges
+        self.is_date = is_date
+
+    @classmethod
+    def from_series(cls, series, edges=None, **kwargs):
+        is_date = pd.api.types.is_datetime64_any_dtype(series)
+        values = series.dropna().values
+        if is_date:
+            values = values.view(np.int64)
+        values = values.astype(np.float64)
+        counts, _ = np.histogram(values[np.isfinite(values)], bins=edges)
+        return cls(counts, edges, is_date)
+
+    def merge(self, other):
+        return Histogram(self.counts + other.counts, self.edges, self.is_date)
+
+
+class PartitionPercentiles(Accumulator):
+    """Percentiles of each partition, merged into approximate percentiles of the whole data.
+
+    This is the algorithm of `Series.quantile` in dask, as a summary which can
+    be computed with the others, and which gives NaN instead of failing if
+    there is no data.
+
+    Attributes
+    ----------
+    percentiles : ndarray
+        The percentiles computed on each partition, in [0, 100].
+    values : list
+        The percentiles of each non empty partition.
+    counts : list
+        The number of values of each non empty partition.
+    """
+
+    def __init__(self, percentiles, values=(), counts=()):
+        self.percentiles = percentiles
+        self.values = list(values)
+        self.counts = list(counts)
+
+    @classmethod
+    def from_series(cls, series, q=(0.05, 0.25, 0.5, 0.75, 0.95), **kwargs):
+        # 0 and 100 are added for a more robust merge, as dask does
+        percentiles = np.pad(np.asarray(q, dtype=np.float64) * 100, 1, mode='constant')
+        percentiles[-1] = 100
+        values = _non_missing_values(series)
+        if len(values) == 0:
+            return cls(percentiles)
+        return cls(percentiles, [np.percentile(values, percentiles)], [len(values)])
+
+    def merge(self, other):
+        return PartitionPercentiles(self.percentiles, self.values + other.values, self.counts + other.counts)
+
+    def quantiles(self, q):
+        """Return the approximate quantiles (in [0, 1]) of the data, NaN if there is none."""
+        if len(self.values) == 0:
+            return np.full(len(q), np.nan)
+        return merge_percentiles(np.asarray(q, dtype=np.float64) * 100, [self.percentiles] * len(self.values),
+                                 self.values, Ns=self.counts)
+
+
+def _scale(q, compression):
+    """The k1 scale function of the t-digest, steep in the tails of the distribution."""
+    return compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+
+
+class TDigest(Accumulator):
+    """Mergeable quantile sketch (t-digest, Dunning & Ertl).
+
+    The data is summarized by weighted centroids which are small in the tails
+    and larger in the middle of the distribution. The number of centroids, and
+    hence the memory, is bounded by about `compression` whatever the size of
+    the data. The rank error is of the order of `1 / compression` around the
+    median and much smaller in the tails. Data smaller than the compression is
+    kept exactly.
+
+    Attributes
+    ----------
+    means : ndarray
+        The sorted means of the centroids.
+    weights : ndarray
+        The number of observations of each centroid.
+    minimum, maximum : float
+        Extrema of the observations.
+    compression : float
+        The accuracy parameter.
+    """
+
+    def __init__(self, means, weights, minimum=np.nan, maximum=np.nan, compression=100):
+        self.means = means
+        self.weights = weights
+        self.minimum = minimum
+        self.maximum = maximum
+        self.compression = compression
+
+    @classmethod
+    def from_series(cls, series, compression=100, **kwargs):
+        values = _non_missing_values(series)
+        values = np.sort(values[np.isfinite(values)])
+        if len(values) == 0:
+            return cls(values, values, compression=compression)
+        return cls._compress(values, np.ones(len(values)), values[0], values[-1], compression)
+
+    @classmethod
+    def _compress(cls, means, weights, minimum, maximum, compression):
+        """Merge the adjacent (sorted) centroids which fall in the same unit of the scale function."""
+        total = weights.sum()
+        if len(means) <= compression:
+            return cls(means, weights, minimum, maximum, compression)
+        q = (np.cumsum(weights) - weights / 2) / total
+        groups = np.floor(_scale(q, compression))
+        starts = np.flatnonzero(np.diff(groups, prepend=-np.inf))
+        merged_weights = np.add.reduceat(weights, starts)
+        merged_means = np.add.reduceat(means * weights, starts) / merged_weights
+        return cls(merged_means, merged_weights, minimum, maximum, compression)
+
+    def merge(self, other):
+        means = np.concatenate([self.means, other.means])
+        weights = np.concatenate([self.weights, other.weights])
+        order = np.argsort(means, kind='mergesort')
+        return TDigest._compress(means[order], weights[order],
+                                 np.fmin(self.minimum, other.minimum), np.fmax(self.maximum, other.maximum),
+                                 max(self.compression, other.compression))
+
+    @property
+    def count(self):
+        return self.weights.sum()
+
+    def quantiles(self, q):
+        """Estimate quantiles of the data.
+
+        The centroids are interpolated linearly at the rank of their center,
+        which gives the same result as `pandas.Series.quantile` when the data
+        is kept exactly.
+
+        Parameters
+        ----------
+        q : array_like
+            The quantiles to compute, between 0 and 1.
+
+        Returns
+        -------
+        ndarray
+            The estimated quantiles, NaN if there is no data.
+        """
+        q = np.asarray(q, dtype=np.float64)
+        if len(self.means) == 0:
+            return np.full(q.shape, np.nan)
+        total = self.count
+        centers = np.cumsum(self.weights) - (self.weights + 1) / 2
+        ranks, values = [centers], [self.means]
+        if centers[0] > 0:
+            ranks.insert(0, [0])
+            values.insert(0, [self.minimum])
+        if centers[-1] < total - 1:
+            ranks.append([total - 1])
+            values.append([self.maximum])
+        return np.interp(q * (total - 1), np.concatenate(ranks), np.concatenate(values))
+
+    def ranks(self, values):
+        """Estimate the ranks of values among the data, the inverse of `quantiles`.
+
+        The ranks start at 0 and the tied values get their mean rank, so they are the
+        same as `pandas.Series.rank() - 1` when the data is kept exactly.
+
+        Parameters
+        ----------
+        values : array_like
+            The values to rank.
+
+        Returns
+        -------
+        ndarray
+            The estimated ranks, NaN for the missing values or if there is no data.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if len(self.means) == 0:
+            return np.full(values.shape, np.nan)
+        # The tied centroids (exact data) share their mean rank
+        means, inverse = np.unique(self.means, return_inverse=True)
+        weights = np.bincount(inverse, weights=self.weights)
+        total = weights.sum()
+        centers = np.cumsum(weights) - (weights + 1) / 2
+        ranks, points = [centers], [means]
+        if centers[0] > 0 and self.minimum < means[0]:
+            ranks.insert(0, [0])
+            points.insert(0, [self.minimum])
+        if centers[-1] < total - 1 and self.maximum > means[-1]:
+            ranks.append([total - 1])
+            points.append([self.maximum])
+        result = np.interp(values, np.concatenate(points), np.concatenate(ranks))
+        result[np.isnan(values)] = np.nan
+        return result
+
+    def histogram(self, edges, is_date=False):
+        """Estimate the bin counts of the data, each centroid counting in the bin of its mean.
+
+        The counts are exact when the data is kept exactly.
+        """
+        counts, _ = np.histogram(self.means, bins=edges, weights=self.weights)
+        return Histogram(counts, edges, is_date)
+
+    def mean_absolute_deviation(self, center):
+        """Estimate the mean absolute deviation of the data from `center`, exact when the data is kept exactly."""
+        if len(self.means) == 0:
+            return np.nan
+        return (self.weights * np.abs(self.means - center)).sum() / self.count
+
+
+def hash_values(series):
+    """Hash the values of a Series to 64 bits integers, missing values included.
+
+    Raises
+    ------
+    TypeError
+        If the Series mixes types which can't be compared (lists, dicts, ...).
+    """
+    if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) == 'mixed':
+        raise TypeError('Not supported mixed type')
+    return pd.util.hash_pandas_object(series, index=False).values
+
+
+class ValueCounts(Accumulator):
+    """Exact value counts of a variable, missing values excluded.
+
+    The memory grows with the number of distinct values, see `FrequentValues`
+    and `HyperLogLog` for bounded alternatives.
+
+    Attributes
+    ----------
+    counts : Series
+        The count of each value.
+    has_missing : bool
+        Whether there are missing values.
+    """
+
+    relative_error = 0.0
+    error = 0
+
+    def __init__(self, counts, has_missing=False):
+        self.counts = counts
+        self.has_missing = has_missing
+
+    @classmethod
+    def from_series(cls, series, **kwargs):
+        if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) == 'mixed':
+            raise TypeError('Not supported mixed type')
+        return cls(series.dropna().value_counts(), bool(series.isnull().any()))
+
+    def merge(self, other):
+        return ValueCounts(self.counts.add(other.counts, fill_value=0).astype(np.int64),
+                           self.has_missing or other.has_missing)
+
+    def count(self):
+        """Return the number of distinct values, missing values counting as one."""
+        return len(self.counts) + int(self.has_missing)
+
+    def frequencies(self):
+        """Return the counts by decreasing count, ties by value."""
+        return sort_frequencies(self.counts)
+
+
+class HyperLogLog(Accumulator):
+    """Mergeable distinct count sketch (HyperLogLog with a sparse exact mode).
+
+    The hashes of the values are kept exactly as long as there are fewer than
+    `2 ** precision / 4` of them, the count is then exact (up to 64 bits hash
+    collisions). Above, they are folded into `2 ** precision` registers and
+    the count is estimated with a relative standard error of
+    `1.04 / sqrt(2 ** precision)`, about 0.8% for the default precision.
+
+    Attributes
+    ----------
+    hashes : ndarray or None
+        The distinct hashes in sparse mode.
+    registers : ndarray or None
+        The registers in dense mode.
+    precision : int
+        The number of bits used to address the registers.
+    """
+
+    def __init__(self, hashes=None, registers=None, precision=14):
+        self.hashes = hashes
+        self.registers = registers
+        self.precision = precision
+
+    @property
+    def sparse_limit(self):
+        return 2 ** self.precision // 4
+
+    @property
+    def is_exact(self):
+        return self.registers is None
+
+    @classmethod
+    def from_series(cls, series, precision=14, **kwargs):
+        return cls(np.unique(hash_values(series)), precision=precision)._densify_if_needed()
+
+    @classmethod
+    def from_hashes(cls, hashes, precision=14):
+        """Build the sketch from already hashed values (see `hash_values`)."""
+        return cls(np.unique(hashes), precision=precision)._densify_if_needed()
+
+    def _densify_if_needed(self):
+        if self.hashes is not None and len(self.hashes) > self.sparse_limit:
+            return HyperLogLog(registers=self._registers_of(self.hashes), precision=self.precision)
+        return self
+
+    def _registers_of(self, hashes):
+        """Fold hashes into registers holding the position of their leftmost 1-bit."""
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.intp)
+        remainder = hashes & np.uint64((1 << (64 - p)) - 1)
+        # frexp gives the bit length of the remainder (0 for 0)
+        rank = (64 - p) - np.frexp(remainder.astype(np.float64))[1] + 1
+        registers = np.zeros(2 ** p, dtype=np.uint8)
+        np.maximum.at(registers, index, rank.astype(np.uint8))
+        return registers
+
+    def merge(self, other):
+        if self.is_exact and other.is_exact:
+            return HyperLogLog(np.union1d(self.hashes, other.hashes), precision=self.precision)._densify_if_needed()
+        registers = [self.registers if not self.is_exact else self._registers_of(self.hashes),
+                     other.registers if not other.is_exact else self._registers_of(other.hashes)]
+        return HyperLogLog(registers=np.maximum(*registers), precision=self.precision)
+
+    @property
+    def relative_error(self):
+        """The relative standard error of the count (0 in sparse mode)."""
+        return 0.0 if self.is_exact else 1.04 / np.sqrt(2 ** self.precision)
+
+    def count(self):
+        """Return the (estimated) number of distinct values."""
+        if self.is_exact:
+            return len(self.hashes)
+        m = float(len(self.registers))
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        n_empty = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and n_empty > 0:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * np.log(m / n_empty)
+        return int(round(estimate))
+
+
+def sort_frequencies(freq):
+    """Sort value counts by decreasing count, ties by increasing value when the values can be compared."""
+    try:
+        freq = freq.sort_index()
+    except TypeError:
+        pass
+    return freq.iloc[np.argsort(-freq.values, kind='mergesort')]
+
+
+def _sort_index(freq):
+    """Sort by value, or drop everything if the values can't be compared (mixed types)."""
+    try:
+        return freq.sort_index()
+    except TypeError:
+        return freq.iloc[:0]
+
+
+class FrequentValues(Accumulator):
+    """Mergeable heavy hitters (Space-Saving) and extreme values of a variable.
+
+    At most `capacity` values are monitored. Each monitored count is an
+    overestimate of the true count by at most its error, and a value which is
+    not monitored has a true count of at most the smallest monitored count.
+    Summaries are merged as described by Cafaro et al. (2016).
+
+    The `n_extremes` smallest and largest values are also kept with their
+    exact counts, for the extreme values of the report, unless the values
+    can't be compared.
+
+    Attributes
+    ----------
+    counts : Series
+        The estimated counts of the monitored values.
+    errors : Series
+        The maximum overestimation of each count.
+    smallest, largest : Series
+        The exact counts of the smallest and largest values.
+    capacity : int
+        The maximum number of monitored values.
+    n_extremes : int
+        The number of smallest and largest values kept.
+    """
+
+    def __init__(self, counts, errors, smallest, largest, capacity=100, n_extremes=5):
+        self.counts = counts
+        self.errors = errors
+        self.smallest = smallest
+        self.largest = largest
+        self.capacity = capacity
+        self.n_extremes = n_extremes
+
+    @classmethod
+    def from_series(cls, series, capacity=100, n_extremes=5, **kwargs):
+        value_counts = series.dropna().value_counts()
+        by_value = _sort_index(value_counts)
+        counts = value_counts.iloc[:capacity]
+        return cls(counts, pd.Series(0, index=counts.index, dtype=np.int64),
+                   by_value.iloc[:n_extremes], by_value.iloc[-n_extremes:], capacity, n_extremes)
+
+    @property
+    def min_count(self):
+        """The bound on the count of the values which are not monitored."""
+        return self.counts.min() if len(self.counts) >= self.capacity else 0
+
+    def merge(self, other):
+        index = self.counts.index.union(other.counts.index)
+        counts = (self.counts.reindex(index, fill_value=self.min_count)
+                  + other.counts.reindex(index, fill_value=other.min_count))
+        errors = (self.errors.reindex(index, fill_value=self.min_count)
+                  + other.errors.reindex(index, fill_value=other.min_count))
+        counts = sort_frequencies(counts).iloc[:self.capacity]
+
+        smallest = _sort_index(self.smallest.add(other.smallest, fill_value=0))
+        largest = _sort_index(self.largest.add(other.largest, fill_value=0))
+        return FrequentValues(counts, errors[counts.index], smallest.iloc[:self.n_extremes],
+                              largest.iloc[-self.n_extremes:], self.capacity, self.n_extremes)
+
+    @property
+    def error(self):
+        """The maximum overestimation of the monitored counts."""
+        return self.errors.max() if len(self.errors) > 0 else 0
+
+    def frequencies(self):
+        """Return the monitored and extreme values with their counts, by decreasing count.
+
+        Returns
+        -------
+        Series
+            The counts indexed by value, exact for the extreme values.
+        """
+        extremes = pd.concat([self.smallest, self.largest])
+        extremes = extremes[~extremes.index.duplicated()]
+        return sort_frequencies(extremes.combine_first(self.counts).astype(np.int64))
+
+
+def hash_rows(df):
+    """Hash the rows of a DataFrame to 64 bits integers.
+
+    The columns which can't be hashed (see `hash_values`) are left out. They
+    are reported as unsupported and left out of the duplicate count anyway.
+    """
+    result = np.zeros(len(df), dtype=np.uint64)
+    for col in df.columns:
+        try:
+            hashes = hash_values(df[col])
+        except TypeError:
+            continue
+        # Same combination as pandas.util.hash_pandas_object, order dependent
+        result = result * np.uint64(1000003) ^ hashes
+    return result
+
+
+def row_hashes(df):
+    """Hash the rows of a DataFrame to a Series of 64 bits integers (see `hash_rows`), named by the columns."""
+    return pd.Series(hash_rows(df), index=df.index, name=tuple(df.columns))
+
+
+class DistinctRows(Accumulator):
+    """Exact number of distinct rows of a DataFrame, from the hashes of the rows (see `row_hashes`).
+
+    Only the 8 bytes hashes are kept, but all the distinct ones are. They can be split
+    in buckets by value, each bucket being counted by its own accumulator, so that the
+    memory of each of them is bounded by the distinct hashes of its bucket.
+
+    Attributes
+    ----------
+    hashes : ndarray
+        The distinct hashes.
+    """
+
+    def __init__(self, hashes):
+        self.hashes = hashes
+
+    @classmethod
+    def from_series(cls, series, bucket=0, n_buckets=1, **kwargs):
+        hashes = series.values.astype(np.uint64)
+        if n_buckets > 1:
+            hashes = hashes[hashes % np.uint64(n_buckets) == bucket]
+        return cls(np.unique(hashes))
+
+    def merge(self, other):
+        return DistinctRows(np.union1d(self.hashes, other.hashes))
+
+    def count(self):
+        return len(self.hashes)
+
+
+class ApproxDistinctRows(HyperLogLog):
+    """Approximate number of distinct rows of a DataFrame, from the hashes of the rows.
+
+    Unlike `DistinctRows` the memory is bounded whatever the number of rows.
+    """
+
+    @classmethod
+    def from_series(cls, series, precision=14, **kwargs):
+        return cls.from_hashes(hash_rows(series), precision)
+
+
+def _sum_by_code(codes, labels):
+    """Sum the labels (modulo 2 ** 64 for hashes) by code, return the sorted distinct codes and their sums."""
+    codes, inverse = np.unique(codes, return_inverse=True)
+    sums = np.zeros(len(codes), dtype=labels.dtype)
+    np.add.at(sums, inverse, labels)
+    return codes, sums
+
+
+class RowGroups(Accumulator):
+    """Hashed partitions of the rows of a DataFrame by the values of each column, to find the recoded columns.
+
+    A column is a recoding of another one if there is a one-to-one mapping between their
+    values, that is if their values group the rows in the same way. Each row gets a label
+    (the hash of its values) and each group of rows is summarized by the sum of the labels
+    of its rows, which is mergeable across partitions. So two columns group the rows in the
+    same way if they have the same sums (up to hash collisions), which is checked for all
+    the columns at once by comparing their signatures, without crosstabs.
+
+    Attributes
+    ----------
+    groups : dict
+        For each column, the sorted hashes of its values and the sums of the labels of their
+        rows, `None` if the column can't be hashed or has more than `max_groups` values.
+    max_groups : int
+        The maximum number of values kept per column.
+    """
+
+    def __init__(self, groups, max_groups=10000):
+        self.groups = groups
+        self.max_groups = max_groups
+
+    @classmethod
+    def from_series(cls, series, max_groups=10000, **kwargs):
+        labels = hash_rows(series)
+        groups = dict()
+        for col in series.columns:
+            try:
+                groups[col] = _sum_by_code(hash_values(series[col]), labels)
+            except TypeError:
+                groups[col] = None
+            if groups[col] is not None and len(groups[col][0]) > max_groups:
+                groups[col] = None
+        return cls(groups, max_groups)
+
+    def merge(self, other):
+        groups = dict()
+        for col, group in self.groups.items():
+            other_group = other.groups[col]
+            if group is None or other_group is None:
+                groups[col] = None
+                continue
+            groups[col] = _sum_by_code(np.concatenate([group[0], other_group[0]]),
+                                       np.concatenate([group[1], other_group[1]]))
+            if len(groups[col][0]) > self.max_groups:
+                groups[col] = None
+        return RowGroups(groups, self.max_groups)
+
+    def signatures(self):
+        """Return the signature of each column, they are equal for the columns grouping the rows the same way.
+
+        Returns
+        -------
+        dict
+            The signature of each column, the columns whose groups were not kept are left out.
+        """
+        return {col: np.sort(group[1]).tobytes() for col, group in self.groups.items() if group is not None}
+
+    def recoded(self, columns=None, overrides=None):
+        """Find the recoded columns.
+
+        Parameters
+        ----------
+        columns : list
+            The columns to compare, all by default.
+        overrides : list
+            Columns which are never reported as recoded.
+
+        Returns
+        -------
+        dict
+            For each recoded column, the column it is a recoding of. Among the columns
+            grouping the rows the same way, the last one is kept.
+        """
+        columns = list(self.groups) if columns is None else columns
+        signatures = self.signatures()
+        kept = dict()
+        for col in reversed(columns):
+            if col in signatures:
+                kept.setdefault(signatures[col], col)
+        result = dict()
+        for col in columns:
+            if col in signatures and kept[signatures[col]] != col and not (overrides and col in overrides):
+                result[col] = kept[signatures[col]]
+        return result
+
+
+class Contingency(Accumulator):
+    """Sparse contingency tables of all the pairs of categorical columns of a DataFrame, for Cramér's V.
+
+    The levels of each column are given (typically its most frequent values), the other
+    values are counted together so that the tables stay small. The rows where a value of
+    the pair is missing are left out. All the pairs are counted from each partition.
+
+    Attributes
+    ----------
+    levels : dict
+        The levels of each column, the other values are coded `len(levels[col])`.
+    tables : dict
+        For each pair of columns, the codes of the non-empty cells (`code_x * (n_levels_y + 1) + code_y`)
+        and their counts.
+    """
+
+    def __init__(self, levels, tables):
+        self.levels = levels
+        self.tables = tables
+
+    @classmethod
+    def from_series(cls, series, levels=None, **kwargs):
+        levels = {col: list(values) for col, values in levels.items()}
+        codes = dict()
+        for col, values in levels.items():
+            code = pd.Index(values).get_indexer(series[col])
+            code[code < 0] = len(values)
+            codes[col] = np.where(series[col].isnull().values, -1, code)
+        tables = dict()
+        columns = list(levels)
+        for i, x in enumerate(columns):
+            for y in columns[i + 1:]:
+                present = (codes[x] >= 0) & (codes[y] >= 0)
+                cells = codes[x][present] * (len(levels[y]) + 1) + codes[y][present]
+                tables[x, y] = _sum_by_code(cells, np.ones(len(cells), dtype=np.int64))
+        return cls(levels, tables)
+
+    def merge(self, other):
+        tables = {pair: _sum_by_code(np.concatenate([cells, other.tables[pair][0]]),
+                                     np.concatenate([counts, other.tables[pair][1]]))
+                  for pair, (cells, counts) in self.tables.items()}
+        return Contingency(self.levels, tables)
+
+    def table(self, x, y):
+        """Return the contingency table of a pair of columns as a dense array, the other values last."""
+        cells, counts = self.tables[x, y]
+        table = np.zeros((len(self.levels[x]) + 1) * (len(self.levels[y]) + 1), dtype=np.int64)
+        table[cells] = counts
+        return table.reshape(len(self.levels[x]) + 1, len(self.levels[y]) + 1)
+
+    def cramers_v(self):
+        """Return the matrix of the bias corrected Cramér's V (Bergsma, 2013) as a DataFrame.
+
+        It is NaN for the pairs without data or for which a column has a single value.
+        """
+        columns = list(self.levels)
+        result = pd.DataFrame(np.eye(len(columns)), index=columns, columns=columns)
+        for x, y in self.tables:
+            table = self.table(x, y)
+            table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+            n = table.sum()
+            r, k = table.shape
+            v = np.nan
+            if n > 1 and r > 1 and k > 1:
+                expected = np.outer(table.sum(axis=1), table.sum(axis=0)) / n
+                phi2 = ((table - expected) ** 2 / expected).sum() / n
+                phi2 = max(0.0, phi2 - (k - 1) * (r - 1) / (n - 1.0))
+                r_corr = r - (r - 1) ** 2 / (n - 1.0)
+                k_corr = k - (k - 1) ** 2 / (n - 1.0)
+                if min(k_corr, r_corr) > 1:
+                    v = np.sqrt(phi2 / min(k_corr - 1, r_corr - 1))
+            result.loc[x, y] = result.loc[y, x] = v
+        return result
+
+
+class CoMoments(Accumulator):
+    """Co-moments of the pairs of numerical columns of a DataFrame, for the Pearson correlations.
+
+    The pairs are made of a column of `rows` and a column of `columns`, so that a wide
+    DataFrame can be tiled in blocks of columns. Like pandas, each pair is computed on the
+    rows where both values are present, so the moments are kept for each pair. They are
+    merged with the pairwise update formulas of Chan et al.
+
+    Attributes
+    ----------
+    rows : list
+        The names of the first columns of the pairs.
+    columns : list
+        The names of the second columns of the pairs.
+    n : ndarray
+        `n[i, j]` is the number of rows where both the columns `rows[i]` and `columns[j]` are present.
+    mu_x, mu_y : ndarray
+        `mu_x[i, j]` and `mu_y[i, j]` are the means of the columns `rows[i]` and `columns[j]` on these rows.
+    m2_x, m2_y : ndarray
+        The sums of their squared deviations on these rows.
+    c : ndarray
+        `c[i, j]` is the sum of the products of their deviations.
+    """
+
+    def __init__(self, rows, columns, n, mu_x, mu_y, m2_x, m2_y, c):
+        self.rows = rows
+        self.columns = columns
+        self.n = n
+        self.mu_x = mu_x
+        self.mu_y = mu_y
+        self.m2_x = m2_x
+        self.m2_y = m2_y
+        self.c = c
+
+    @staticmethod
+    def _center(values):
+        """Shift the values by the column means (to limit the cancellations of the sums of products)."""
+        present = ~np.isnan(values)
+        shift = np.zeros(values.shape[1])
+        counts = present.sum(axis=0)
+        sums = np.where(present, values, 0).sum(axis=0)
+        np.divide(sums, counts, out=shift, where=counts > 0)
+        return np.where(present, values - shift, 0), present.astype(np.float64), shift
+
+    @classmethod
+    def from_series(cls, series, rows=None, columns=None, **kwargs):
+        """Summarize the pairs of `rows` and `columns` (all the columns of `series` by default)."""
+        rows = list(series.columns) if rows is None else list(rows)
+        columns = list(series.columns) if columns is None else list(columns)
+        x, mask_x, shift_x = cls._center(series[rows].values.astype(np.float64))
+        y, mask_y, shift_y = cls._center(series[columns].values.astype(np.float64))
+        n = mask_x.T @ mask_y
+        s1_x = x.T @ mask_y
+        s1_y = mask_x.T @ y
+        s2_x = (x ** 2).T @ mask_y
+        s2_y = mask_x.T @ y ** 2
+        products = x.T @ y
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mu_x = np.where(n > 0, s1_x / n, 0)
+            mu_y = np.where(n > 0, s1_y / n, 0)
+            m2_x = np.where(n > 0, s2_x - s1_x * mu_x, 0)
+            m2_y = np.where(n > 0, s2_y - s1_y * mu_y, 0)
+            c = np.where(n > 0, products - s1_x * mu_y, 0)
+        return cls(rows, columns, n, mu_x + shift_x[:, None], mu_y + shift_y[None, :], m2_x, m2_y, c)
+
+    def merge(self, other):
+        n = self.n + other.n
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.where(n > 0, self.n * other.n / n, 0)
+            ratio = np.where(n > 0, other.n / n, 0)
+        delta_x = other.mu_x - self.mu_x
+        delta_y = other.mu_y - self.mu_y
+        return CoMoments(self.rows, self.columns, n, self.mu_x + delta_x * ratio, self.mu_y + delta_y * ratio,
+                         self.m2_x + other.m2_x + delta_x ** 2 * weight,
+                         self.m2_y + other.m2_y + delta_y ** 2 * weight,
+                         self.c + other.c + delta_x * delta_y * weight)
+
+    def correlations(self):
+        """Return the Pearson correlations of the pairs as a DataFrame, NaN for the constant columns."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = self.c / np.sqrt(self.m2_x * self.m2_y)
+        corr[self.n < 1] = np.nan
+        return pd.DataFrame(corr, index=self.rows, columns=self.columns)
@@ -1,7 +1,21 @@
 # -*- coding: utf-8 -*-
 """Common parts to all other modules, mainly utility functions.
 """
+import os
+import pickle
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+import numpy as np
 import pandas as pd
+import dask.dataframe as dd
+from dask import delayed, compute, is_dask_collection
+from dask.base import tokenize
+from dask.sizeof import sizeof
+from dask.utils import M
+import dask_profiling.accumulators as accumulators
 
 TYPE_CAT = 'CAT'
 """String: A categorical variable"""
@@ -24,106 +38,400 @@ S_TYPE_UNIQUE = 'UNIQUE'
 S_TYPE_UNSUPPORTED = 'UNSUPPORTED'
 """String: An unsupported variable"""
 
-_VALUE_COUNTS_MEMO = {}
+SNIFF_ROWS = 100
+"""Int: Number of rows of the first partition used to sniff the type of the object variables"""
 
-def get_groupby_statistic(data):
-    """Calculate value counts and distinct count of a variable (technically a Series).
+CACHE_BYTES = 2 ** 28
+"""Int: Default memory budget of the statistics cache, in bytes"""
 
-    The result is cached by column name in a global variable to avoid recomputing.
+
+@sizeof.register(accumulators.Accumulator)
+def _sizeof_accumulator(accumulator):
+    return sum(sizeof(value) for value in vars(accumulator).values())
+
+
+class StatsCache(object):
+    """Least recently used cache of statistics, bounded by a memory budget.
+
+    The statistics are keyed by the deterministic token of the dask collection they are
+    computed from (see `dask.base.tokenize`) and by their parameters. So they are reused by
+    the later profiles of the same data, and never confused between variables with the same name.
+
+    The summaries planned with `reduce` or `lazy` are served from the cache when they
+    were computed before, they must be computed with `compute` to be stored. The planned
+    summaries are kept per thread and per `session`, so that a profile never computes
+    the ones planned by another.
 
     Parameters
     ----------
-    data : Series
-        The data type of the Series.
+    max_bytes : int
+        The memory budget, the least recently used statistics are evicted beyond it.
+    """
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._local = threading.local()
+
+    @property
+    def _pending(self):
+        """The summaries planned but not computed yet, in the current thread and session."""
+        if not hasattr(self._local, 'pending'):
+            self._local.pending = []
+        return self._local.pending
+
+    @_pending.setter
+    def _pending(self, pending):
+        self._local.pending = pending
+
+    @contextmanager
+    def session(self):
+        """Plan summaries apart from the ones planned before, those not computed are discarded at the end.
+
+        So a profile failing between the planning and `compute` leaves nothing behind.
+        """
+        previous = self._pending
+        self._pending = []
+        try:
+            yield self
+        finally:
+            self._pending = previous
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """Return the statistic stored under `key`, `default` if there is none."""
+        if key not in self._data:
+            return default
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def put(self, key, value):
+        """Store a statistic under `key`, those which don't fit in the budget are not stored."""
+        if key in self._data:
+            self.nbytes -= self._sizes.pop(key)
+            del self._data[key]
+        size = sizeof(value)
+        if size > self.max_bytes:
+            return
+        while self.nbytes + size > self.max_bytes:
+            evicted, _ = self._data.popitem(last=False)
+            self.nbytes -= self._sizes.pop(evicted)
+        self._data[key] = value
+        self._sizes[key] = size
+        self.nbytes += size
+
+    def clear(self):
+        """Remove all the statistics."""
+        self._data.clear()
+        self._sizes.clear()
+        self._pending = []
+        self.nbytes = 0
+
+    def lazy(self, collection, *params):
+        """Return the computed value of a dask collection if it is cached, else the collection itself."""
+        key = tokenize(collection, *params)
+        if key in self._data:
+            return self.get(key)
+        self._pending.append((lambda _: key, None, collection))
+        return collection
+
+    def reduce(self, series, accumulator, partition_cache=None, **kwargs):
+        """Return the summary of a dask Series if it is cached, else the lazy one (see `accumulators.reduce_partitions`).
+
+        The keyword arguments may be lazy, the summary is then stored under their computed values.
+        """
+        token = tokenize(series)
+
+        def key(kwargs):
+            return tokenize(token, accumulator.__name__, kwargs)
+
+        if not any(is_dask_collection(value) for value in kwargs.values()):
+            if key(kwargs) in self._data:
+                return self.get(key(kwargs))
+        result = accumulators.reduce_partitions(series, accumulator, partition_cache=partition_cache, **kwargs)
+        self._pending.append((key, kwargs, result))
+        return result
+
+    def compute(self, *args, **kwargs):
+        """Compute like `dask.compute`, and store the summaries planned since the last call."""
+        pending, self._pending = self._pending, []
+        lazy = [(params, result) for _, params, result in pending]
+        results = compute(*(args + (lazy,)), **kwargs)
+        for (key, _, _), (params, value) in zip(pending, results[-1]):
+            self.put(key(params), value)
+        return results[:-1]
+
+
+STATS_CACHE = StatsCache()
+"""StatsCache: The statistics shared by all the profiles of the process"""
+
+
+def planning(func):
+    """Run a function planning and computing summaries in its own session of `STATS_CACHE`."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with STATS_CACHE.session():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def file_partition_ids(paths):
+    """Identify the partitions of a dataset read with one partition per file by the path, size and mtime of the files.
+
+    For example for `dd.read_parquet` on a directory of files, or `dd.read_csv` with `blocksize=None`.
+
+    Parameters
+    ----------
+    paths : list
+        The paths of the files, in the order of the partitions.
 
     Returns
     -------
     list
-        value count and distinct count
+        The identifiers of the partitions, they change when the files change.
+    """
+    ids = []
+    for path in paths:
+        stat = os.stat(path)
+        ids.append('{}:{}:{}'.format(os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+    return ids
+
+
+class PartitionCache(object):
+    """On-disk cache of the summaries of the partitions, to profile again a dataset after some of its partitions changed.
+
+    The summaries are stored as pickle files in a directory, keyed by the identifier of
+    their partition, the variable, the accumulator and its parameters. Only the partitions
+    which are not found are read, their summaries are merged with the cached ones.
+
+    The summaries are stored by the tasks computing them, so with a distributed scheduler
+    the directory must be shared by the workers.
+
+    Parameters
+    ----------
+    directory : str
+        Where the summaries are stored, created if it doesn't exist.
+    partition_ids : list
+        An identifier for each partition of the profiled dataset, which changes when the data
+        of the partition changes (see `file_partition_ids`). By default the partitions are
+        identified by their dask token, which changes with any partition of the dataset.
+    """
+
+    def __init__(self, directory, partition_ids=None):
+        self.directory = directory
+        self.partition_ids = partition_ids
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def key(self, data, i, part, accumulator, kwargs):
+        """Return the key of the summary of the `i`-th partition `part` of `data`."""
+        if self.partition_ids is None:
+            partition_id = tokenize(part)
+        elif len(self.partition_ids) != data.npartitions:
+            raise ValueError("partition_ids must have one item per partition ({})".format(data.npartitions))
+        else:
+            partition_id = self.partition_ids[i]
+        name = tuple(data.columns) if hasattr(data, 'columns') else data.name
+        return tokenize(partition_id, name, accumulator.__name__, kwargs)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def load(self, key):
+        """Return the summary stored under `key`, `None` if there is none."""
+        try:
+            with open(self._path(key), 'rb') as f:
+                return pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def save(self, key, summary):
+        """Store a summary under `key` and return it."""
+        path = self._path(key)
+        # Written aside then moved, so that a partial file is never loaded
+        tmp_path = '{}.{}.tmp'.format(path, uuid.uuid4().hex)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(summary, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return summary
+
+    def clear(self):
+        """Remove all the stored summaries."""
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                os.remove(os.path.join(self.directory, name))
+
+def is_unique(distinct_count, leng, relative_error=0.0):
+    """Whether all the values of a variable are different.
+
+    An approximate distinct count is considered unique if it is within three standard errors of the length.
+
+    Parameters
+    ----------
+    distinct_count : int
+        The (approximate) distinct count of the variable.
+    leng : int
+        The number of observations.
+    relative_error : float
+        The relative standard error of the distinct count.
+
+    Returns
+    -------
+    bool
+        True if the variable is unique.
     """
-    if data._name is not None and data._name in _VALUE_COUNTS_MEMO:
-        return _VALUE_COUNTS_MEMO[data._name]
+    return distinct_count >= leng * (1 - 3 * relative_error)
 
-    value_counts_with_nan = data.value_counts()
-    value_counts_without_nan = data.dropna().value_counts()
-    distinct_count_with_nan = value_counts_with_nan.count()
+def sniff(data):
+    """Return the first `SNIFF_ROWS` rows of a dask collection, only its first partition is read.
 
-    if value_counts_without_nan.index.head(50).inferred_type == "mixed":
-        raise TypeError('Not supported mixed type')
+    Parameters
+    ----------
+    data : Series or DataFrame
+        The data to sniff.
 
-    result = [value_counts_without_nan, distinct_count_with_nan]
+    Returns
+    -------
+    Series or DataFrame
+        The first rows (computed).
+    """
+    key = tokenize(data, 'sniff', SNIFF_ROWS)
+    if key not in STATS_CACHE:
+        STATS_CACHE.put(key, data.get_partition(0).map_partitions(M.head, SNIFF_ROWS).compute())
+    return STATS_CACHE.get(key)
 
-    if data._name is not None:
-        _VALUE_COUNTS_MEMO[data._name] = result
+def _sample_rows(partition, max_rows, seed):
+    """Uniform sample without replacement of at most `max_rows` rows of a partition."""
+    if len(partition) <= max_rows:
+        return partition
+    return partition.sample(n=max_rows, random_state=seed)
 
-    return result
+def sample_partitions(df, sample_fraction=None, max_rows=None, random_state=None):
+    """Draw a random sample of a dask DataFrame, without reading the partitions left out.
 
-# TODO: Speed this up, it's too slow
-_MEMO = {}
-def get_vartype(data):
-    """Infer the type of a variable (technically a Series).
+    A random subset of the partitions is kept, then at most `max_rows` rows spread
+    evenly over these partitions (at least a row per partition), sampled uniformly
+    inside each partition.
+
+    Parameters
+    ----------
+    df : DataFrame
+        The data to sample.
+    sample_fraction : float
+        Fraction of the partitions kept, at least one partition is kept.
+        All the partitions are kept (`None`) by default.
+    max_rows : int
+        Maximum number of rows kept. There is no maximum (`None`) by default.
+    random_state : int or RandomState
+        Seed of the sampling, drawn at random (`None`) by default.
+
+    Returns
+    -------
+    DataFrame
+        The sample, with a partition per kept partition of `df`.
+    """
+    if sample_fraction is not None and not 0 < sample_fraction <= 1:
+        raise ValueError("sample_fraction must be in (0, 1]")
+    if max_rows is not None and max_rows < 1:
+        raise ValueError("max_rows must be positive")
+    random = random_state if isinstance(random_state, np.random.RandomState) else np.random.RandomState(random_state)
+
+    if sample_fraction is not None:
+        size = max(int(round(sample_fraction * df.npartitions)), 1)
+        df = df.partitions[np.sort(random.choice(df.npartitions, size, replace=False)).tolist()]
+    if max_rows is None:
+        return df
+
+    # The rows are spread evenly, a small partition gives less rows
+    rows = max(max_rows // df.npartitions, 1)
+    seeds = random.randint(0, 2 ** 31 - 1, size=df.npartitions)
+    parts = df.to_delayed(optimize_graph=False)
+    return dd.from_delayed([delayed(_sample_rows, pure=True)(part, rows, seed) for part, seed in zip(parts, seeds)],
+                           meta=df._meta)
+
+def get_meta_vartype(dtype, sample=None):
+    """Infer the type of a variable without scanning it, from its dtype and a sample of its values.
+
+    This is the first stage of the type inference, the numerical, date and boolean
+    types are given by the dtype and the object variables holding unhashable values
+    (lists, dicts...) are detected from a sample, typically the head of the first partition.
+    The other types (`S_TYPE_CONST`, `S_TYPE_UNIQUE` and `TYPE_CAT`) depend on the distinct
+    count and are left to `infer_vartype`, which may also turn a numerical or boolean
+    variable into a constant one, or a numerical variable with two values into a boolean one.
+
+    Parameters
+    ----------
+    dtype : dtype
+        The data type of the variable.
+    sample : Series
+        Some values of the variable, `None` if there are none.
+
+    Returns
+    -------
+    str
+        The type of the variable, `None` if it depends on the distinct count.
+    """
+    if pd.api.types.is_bool_dtype(dtype):
+        return TYPE_BOOL
+    elif pd.api.types.is_numeric_dtype(dtype):
+        return TYPE_NUM
+    elif pd.api.types.is_datetime64_dtype(dtype):
+        return TYPE_DATE
+    elif sample is not None and dtype == object and pd.api.types.infer_dtype(sample, skipna=True) == 'mixed':
+        return S_TYPE_UNSUPPORTED
+    return None
+
+def infer_vartype(dtype, distinct_count, leng, relative_error=0.0):
+    """Infer the type of a variable from its dtype and its (computed) counts.
 
     The types supported are split in standard types and special types.
 
     Standard types:
         * Categorical (`TYPE_CAT`): the default type if no other one can be determined
         * Numerical (`TYPE_NUM`): if it contains numbers
-        * Boolean (`TYPE_BOOL`): at this time only detected if it contains boolean values, see todo
+        * Boolean (`TYPE_BOOL`): if it contains boolean values, or two distinct numbers
         * Date (`TYPE_DATE`): if it contains datetime
 
     Special types:
         * Constant (`S_TYPE_CONST`): if all values in the variable are equal
         * Unique (`S_TYPE_UNIQUE`): if all values in the variable are different
-        * Unsupported (`S_TYPE_UNSUPPORTED`): if the variable is unsupported
-
-     The result is cached by column name in a global variable to avoid recomputing.
+        * Unsupported (`S_TYPE_UNSUPPORTED`): detected from the dtype and a sample by `get_meta_vartype`
 
     Parameters
     ----------
-    data : Series
-        The data type of the Series.
+    dtype : dtype
+        The data type of the variable.
+    distinct_count : int
+        The (approximate) distinct count of the variable, missing values included.
+    leng : int
+        The number of observations, only used if the type is not given by the dtype.
+    relative_error : float
+        The relative standard error of the distinct count.
 
     Returns
     -------
     str
-        The data type of the Series.
-
-    Notes
-    ----
-        * Should improve verification when a categorical or numeric field has 3 values, it could be a categorical field
-        or just a boolean with NaN values
-        * #72: Numeric with low Distinct count should be treated as "Categorical"
+        The type of the variable.
     """
-    if data._name is not None and data._name in _MEMO:
-        return _MEMO[data._name]
-
-    vartype = None
-    try:
-        distinct_count = get_groupby_statistic(data)[1].compute()
-        leng = data.size
-
-        if distinct_count <= 1:
-            vartype = S_TYPE_CONST
-        elif pd.api.types.is_bool_dtype(data) or (distinct_count == 2 and pd.api.types.is_numeric_dtype(data)):
-            vartype = TYPE_BOOL
-        elif pd.api.types.is_numeric_dtype(data):
-            vartype = TYPE_NUM
-        elif pd.api.types.is_datetime64_dtype(data):
-            vartype = TYPE_DATE
-        elif distinct_count == leng:
-            vartype = S_TYPE_UNIQUE
-        else:
-            vartype = TYPE_CAT
-    except:
-        vartype = S_TYPE_UNSUPPORTED
-
-    if data._name is not None:
-        _MEMO[data._name] = vartype
-
-    return vartype
+    vartype = get_meta_vartype(dtype)
+    if distinct_count <= 1:
+        return S_TYPE_CONST
+    elif vartype == TYPE_BOOL or (distinct_count == 2 and vartype == TYPE_NUM):
+        return TYPE_BOOL
+    elif vartype is not None:
+        return vartype
+    elif is_unique(distinct_count, leng, relative_error):
+        return S_TYPE_UNIQUE
+    else:
+        return TYPE_CAT
 
 def clear_cache():
-    """Clear the cache stored as global variables"""
-    global _MEMO, _VALUE_COUNTS_MEMO
-    _MEMO = {}
-    _VALUE_COUNTS_MEMO = {}
+    """Clear the statistics cache shared by the profiles (`STATS_CACHE`)"""
+    STATS_CACHE.clear()
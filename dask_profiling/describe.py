@@ -1,79 +1,136 @@
 # -*- coding: utf-8 -*-
 """Compute statistical description of datasets"""
 import multiprocessing
-import itertools
-from functools import partial
 import numpy as np
 import pandas as pd
-import scipy as sp
 import dask.dataframe as dd
-from dask import delayed, compute
-from dask.array import stats as dask_stats
-import matplotlib
-from pkg_resources import resource_filename
+from dask import delayed, compute, is_dask_collection
 import dask_profiling.formatters as formatters
 import dask_profiling.base as base
-from dask_profiling.plot import histogram, mini_histogram
+import dask_profiling.accumulators as accumulators
+import dask_profiling.parquet as parquet
+import dask_profiling.svg as svg
+from dask_profiling.report import CORRELATION_TITLES
 
-def describe_numeric_1d(series, **kwargs):
-    """Compute summary statistics of a numerical (`TYPE_NUM`) variable (a Series).
+def histogram_edges(minimum, maximum, bins=10):
+    """Compute the bin edges of the histograms, lazily if the bounds are lazy.
+
+    When the bounds come from the statistics cache the edges are computed right away,
+    so that the bin counts can be found in the cache as well.
+    """
+    if is_dask_collection(minimum) or is_dask_collection(maximum):
+        return delayed(accumulators.histogram_edges, pure=True)(minimum, maximum, bins)
+    return accumulators.histogram_edges(minimum, maximum, bins)
+
+PERCENTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+"""List: The percentiles of the numerical variables"""
+
+DUPLICATE_BUCKETS = 16
+"""Int: Maximum number of buckets the hashes of the rows are split in to count the distinct rows exactly"""
+
+CORRELATION_BLOCK_SIZE = 256
+"""Int: Number of columns per block of the correlation matrix, each pair of blocks is a task per partition"""
 
-    Also create histograms (mini an full) of its distribution.
+def numeric_stats(moments, quantiles, mad, histogram):
+    """Derive the statistics of a numerical (`TYPE_NUM`) variable from its summaries.
+
+    The summaries can be lazy, the statistics are then lazy as well.
 
     Parameters
     ----------
-    series : Series
-        The variable to describe.
+    moments : Moments
+        The moments of the variable.
+    quantiles : array_like
+        The quantiles of the variable at `PERCENTILES`.
+    mad : float
+        The mean absolute deviation of the variable.
+    histogram : Histogram
+        The bin counts of the variable.
 
     Returns
     -------
-    Series
-        The description of the variable as a Series with index being stats keys.
+    dict
+        The description of the variable as a dict with keys being stats,
+        plus the `Moments` under the 'moments' key.
     """
     # Format a number as a percentage. For example 0.25 will be turned to 25%.
     _percentile_format = "{:.0%}"
     stats = dict()
 
     stats['type'] = base.TYPE_NUM
-    stats['mean'] = series.mean()
-    stats['std'] = series.std()
-    stats['variance'] = series.var()
-    stats['min'] = series.min()
-    stats['max'] = series.max()
+    stats['mean'] = moments.mean
+    stats['std'] = moments.std
+    stats['variance'] = moments.variance
+    stats['min'] = moments.minimum
+    stats['max'] = moments.maximum
     stats['range'] = stats['max'] - stats['min']
-    # TODO: Remove this "lazy" operation
-    _series_no_na = series.dropna()
-    for percentile in np.array([0.05, 0.25, 0.5, 0.75, 0.95]):
-        # The dropna() is a workaround for https://github.com/pydata/pandas/issues/13098
-        stats[_percentile_format.format(percentile)] = _series_no_na.quantile(percentile)
+    for i, percentile in enumerate(PERCENTILES):
+        stats[_percentile_format.format(percentile)] = quantiles[i]
     stats['iqr'] = stats['75%'] - stats['25%']
-    stats['kurtosis'] = delayed(sp.stats.kurtosis)(series)
-    stats['skewness'] = delayed(float)(dask_stats.skew(series.to_dask_array()))
-    stats['sum'] = series.sum()
-    stats['mad'] = series.sub(series.mean()).abs().mean()
-    # removed conditional for testing (no purpose was seen)
-    # stats['cv'] = stats['std'] / stats['mean'] if stats['mean'] else np.NaN
+    stats['kurtosis'] = moments.kurtosis
+    stats['skewness'] = moments.skewness
+    stats['sum'] = moments.total
+    stats['mad'] = mad
     stats['cv'] = stats['std'] / stats['mean']
-    stats['n_zeros'] = (series.size - delayed(np.count_nonzero)(series))
-    stats['p_zeros'] = stats['n_zeros'] * 1.0 / series.size
-    # Histograms
-    # TODO: optimize histogram and mini_histogram calls (a big overlap in computation)
-    stats['histogram'] = histogram(series, **kwargs)
-    stats['mini_histogram'] = mini_histogram(series, **kwargs)
+    stats['n_zeros'] = moments.n_zeros
+    stats['p_zeros'] = stats['n_zeros'] * 1.0 / moments.size
+    stats['n_infinite'] = moments.n_infinite
+    stats['p_infinite'] = stats['n_infinite'] * 1.0 / moments.size
+    stats['moments'] = moments
+    # Bin counts shared by the histogram and the mini histogram, rendered by describe()
+    stats['histogram'] = histogram
 
     return stats
 
+def describe_numeric_1d(series, **kwargs):
+    """Compute summary statistics of a numerical (`TYPE_NUM`) variable (a Series).
 
-def describe_date_1d(series):
-    """Compute summary statistics of a date (`TYPE_DATE`) variable (a Series).
-
-    Also create histograms (mini an full) of its distribution.
+    Also compute the bin counts of its distribution, used for the histograms.
 
     Parameters
     ----------
     series : Series
         The variable to describe.
 
+    Returns
+    -------
+    dict
+        The lazy description of the variable as a dict with keys being stats,
+        plus the lazy `Moments` under the 'moments' key.
+    """
+    partition_cache = kwargs.get('partition_cache')
+    # All the moment based statistics come from a single pass over the data
+    moments = base.STATS_CACHE.reduce(series, accumulators.Moments, partition_cache)
+    if kwargs.get('quantile_sketch', False):
+        # A single mergeable sketch answers all the percentiles
+        digest = base.STATS_CACHE.reduce(series, accumulators.TDigest, partition_cache,
+                                         compression=kwargs.get('quantile_compression', 100))
+        quantiles = digest.quantiles(PERCENTILES)
+    else:
+        # All the percentiles are computed in one pass, NaN if there are only missing values
+        quantiles = base.STATS_CACHE.reduce(series, accumulators.PartitionPercentiles, partition_cache,
+                                            q=PERCENTILES).quantiles(PERCENTILES)
+    mad = base.STATS_CACHE.reduce(series, accumulators.AbsoluteDeviation, partition_cache,
+                                  center=moments.mean).mean
+    # The extrema known beforehand (parquet footers) let the bin counts be computed in the same pass
+    # The infinite values are left out of the bins
+    minimum, maximum = kwargs.get('extrema', {}).get(series.name, (moments.finite_minimum, moments.finite_maximum))
+    edges = histogram_edges(minimum, maximum, kwargs.get('bins', 10))
+    hist = base.STATS_CACHE.reduce(series, accumulators.Histogram, partition_cache, edges=edges)
+
+    return numeric_stats(moments, quantiles, mad, hist)
+
+
+def date_stats(extremes, histogram):
+    """Derive the statistics of a date (`TYPE_DATE`) variable from its summaries.
+
+    Parameters
+    ----------
+    extremes : Extremes
+        The minimum and maximum of the variable.
+    histogram : Histogram
+        The bin counts of the variable.
+
     Returns
     -------
     dict
@@ -81,32 +138,53 @@ def describe_date_1d(series):
     """
     stats = dict()
     stats['type'] = base.TYPE_DATE
-    stats['min'] = series.min()
-    stats['max'] = series.max()
+    stats['min'] = extremes.minimum
+    stats['max'] = extremes.maximum
     stats['range'] = stats['max'] - stats['min']
-    # Histograms
-    # TODO: optimize histogram and mini_histogram calls (a big overlap in computation)
-    stats['histogram'] = histogram(series)
-    stats['mini_histogram'] = mini_histogram(series)
-    
+    # Bin counts shared by the histogram and the mini histogram, rendered by describe()
+    stats['histogram'] = histogram
+
     return stats
 
-def describe_categorical_1d(series):
-    """Compute summary statistics of a categorical (`TYPE_CAT`) variable (a Series).
+def describe_date_1d(series, **kwargs):
+    """Compute summary statistics of a date (`TYPE_DATE`) variable (a Series).
+
+    Also compute the bin counts of its distribution, used for the histograms.
 
     Parameters
     ----------
     series : Series
         The variable to describe.
 
+    Returns
+    -------
+    dict
+        The lazy description of the variable as a dict with keys being stats.
+    """
+    partition_cache = kwargs.get('partition_cache')
+    extremes = base.STATS_CACHE.reduce(series, accumulators.Extremes, partition_cache)
+    minimum, maximum = kwargs.get('extrema', {}).get(series.name, (extremes.minimum, extremes.maximum))
+    edges = histogram_edges(minimum, maximum, kwargs.get('bins', 10))
+    hist = base.STATS_CACHE.reduce(series, accumulators.Histogram, partition_cache, edges=edges)
+
+    return date_stats(extremes, hist)
+
+def describe_categorical_1d(summary, **kwargs):
+    """Compute summary statistics of a categorical (`TYPE_CAT`) variable.
+
+    Parameters
+    ----------
+    summary : dict
+        The computed summaries of the variable, see `plan_1d`.
+
     Returns
     -------
     dict
         The description of the variable as a dict with keys being stats.
     """
     # Only run if at least 1 non-missing value
-    value_counts, _ = base.get_groupby_statistic(series)
-    top, freq = value_counts.index.head(1).values[0], value_counts.head(1).values[0]
+    value_counts = summary['frequencies'].frequencies()
+    top, freq = value_counts.index[0], value_counts.iloc[0]
     result = {
         'top': top,
         'freq': freq,
@@ -115,24 +193,23 @@ def describe_categorical_1d(series):
 
     return result
 
-def describe_boolean_1d(series):
-    """Compute summary statistics of a boolean (`TYPE_BOOL`) variable (a Series).
+def describe_boolean_1d(summary, **kwargs):
+    """Compute summary statistics of a boolean (`TYPE_BOOL`) variable.
 
     Parameters
     ----------
-    series : Series
-        The variable to describe.
+    summary : dict
+        The computed summaries of the variable, see `plan_1d`.
 
     Returns
     -------
     dict
         The description of the variable as a dict with keys being stats.
     """
-    value_counts, distinct_count = base.get_groupby_statistic(series)
-    value_counts = value_counts.compute()  # TODO: compare .compute() and .head()
+    value_counts = summary['frequencies'].frequencies()
     top, freq = value_counts.index[0], value_counts.iloc[0]
     # The mean of boolean is an interesting information
-    mean = series.mean()
+    mean = summary['moments'].mean if 'moments' in summary else np.nan
     result = {
         'top': top,
         'freq': freq,
@@ -142,13 +219,13 @@ def describe_boolean_1d(series):
 
     return result
 
-def describe_constant_1d(series):
-    """Compute summary statistics of a constant (`S_TYPE_CONST`) variable (a Series).
+def describe_constant_1d(summary):
+    """Compute summary statistics of a constant (`S_TYPE_CONST`) variable.
 
     Parameters
     ----------
-    series : Series
-        The variable to describe.
+    summary : dict
+        The computed summaries of the variable, see `plan_1d`.
 
     Returns
     -------
@@ -157,13 +234,13 @@ def describe_constant_1d(series):
     """
     return {'type': base.S_TYPE_CONST}
 
-def describe_unique_1d(series):
-    """Compute summary statistics of a unique (`S_TYPE_UNIQUE`) variable (a Series).
+def describe_unique_1d(summary):
+    """Compute summary statistics of a unique (`S_TYPE_UNIQUE`) variable.
 
     Parameters
     ----------
-    series : Series
-        The variable to describe.
+    summary : dict
+        The computed summaries of the variable, see `plan_1d`.
 
     Returns
     -------
@@ -172,30 +249,30 @@ def describe_unique_1d(series):
     """
     return {'type': base.S_TYPE_UNIQUE}
 
-def describe_supported(series, **kwargs):
-    """Compute summary statistics of a supported variable (a Series).
+def describe_supported(summary, **kwargs):
+    """Compute summary statistics of a supported variable.
 
     Parameters
     ----------
-    series : Series
-        The variable to describe.
+    summary : dict
+        The computed summaries of the variable, see `plan_1d`.
 
     Returns
     -------
     dict
         The description of the variable as a dict with keys being stats.
     """
-    leng = series.size  # number of observations in the Series
-    count = series.count()  # number of non-NaN observations in the Series
-    n_infinite = count - series.count()  # number of infinte observations in the Series
+    counts = summary['counts']
+    leng = counts.size  # number of observations in the Series
+    count = counts.count  # number of non-NaN observations in the Series
+    n_infinite = 0  # infinite values are only counted for numerical variables
 
-    value_counts, distinct_count = base.get_groupby_statistic(series)
-    count, distinct_count = compute(count, distinct_count)
-    # if all(compute(count > distinct_count, distinct_count > 1)): # Logical AND over the two comparisons
+    distinct_count = summary['distinct'].count()
+    relative_error = summary['distinct'].relative_error
     if count > distinct_count > 1:
-        mode = value_counts.index.head(1).values[0] # TODO: lazy mode
+        mode = summary['frequencies'].frequencies().index[0]
     else:
-        mode = series.head(1, npartitions=-1).values[0]
+        mode = counts.first
 
     results_data = {'count': count,
                     'distinct_count': distinct_count,
@@ -203,103 +280,477 @@ def describe_supported(series, **kwargs):
                     'n_missing': leng - count,
                     'p_infinite': n_infinite * 1.0 / leng,
                     'n_infinite': n_infinite,
-                    'is_unique': distinct_count == leng,
+                    'is_unique': base.is_unique(distinct_count, leng, relative_error),
                     'mode': mode,
-                    'p_unique': distinct_count * 1.0 / leng}
-    try:
-        # pandas 0.17 onwards
-        results_data['memorysize'] = series.memory_usage()
-    except:
-        results_data['memorysize'] = 0
+                    'p_unique': min(distinct_count * 1.0 / leng, 1.0),
+                    'memorysize': counts.memory}
+    if kwargs.get('top_k') is not None:
+        results_data['freq_error'] = summary['frequencies'].error
 
     return results_data
 
-def describe_unsupported(series, **kwargs):
-    """Compute summary statistics of a unsupported (`S_TYPE_UNSUPPORTED`) variable (a Series).
+def describe_unsupported(summary, **kwargs):
+    """Compute summary statistics of a unsupported (`S_TYPE_UNSUPPORTED`) variable.
 
     Parameters
     ----------
-    series : Series
-        The variable to describe.
+    summary : dict
+        The computed summaries of the variable, see `plan_1d`.
 
     Returns
     -------
     dict
         The description of the variable as a dict with keys being stats.
     """
-    leng = series.size  # number of observations in the Series
-    count = series.count()  # number of non-NaN observations in the Series
-    n_infinite = count - series.count()  # number of infinte observations in the Series
+    counts = summary['counts']
+    leng = counts.size  # number of observations in the Series
+    count = counts.count  # number of non-NaN observations in the Series
+    n_infinite = 0  # infinite values are only counted for numerical variables
 
     results_data = {'count': count,
                     'p_missing': 1 - count * 1.0 / leng,
                     'n_missing': leng - count,
                     'p_infinite': n_infinite * 1.0 / leng,
                     'n_infinite': n_infinite,
-                    'type': base.S_TYPE_UNSUPPORTED}
-
-    try:
-        # pandas 0.17 onwards
-        results_data['memorysize'] = series.memory_usage()
-    except:
-        results_data['memorysize'] = 0
+                    'type': base.S_TYPE_UNSUPPORTED,
+                    'memorysize': counts.memory}
 
     return results_data
 
-def describe_1d(data, **kwargs):
-    """Compute summary statistics of a variable (a Series).
+def plan_1d(data, vartype=None, mergeable=False, **kwargs):
+    """Build the lazy summaries of a variable (a Series), without computing anything.
 
-    The description is different according to the type of the variable.
-    However a set of common stats is also computed.
+    Every summary the description may need is planned from the dtype and the type
+    given by `base.get_meta_vartype`, the final type of the variable is only inferred
+    once they are computed (see `finalize_1d`). This way the summaries of all the
+    variables are computed together and the data is read once.
 
     Parameters
     ----------
-    series : Series
+    data : Series
         The variable to describe.
+    vartype : str
+        The type of the variable known before scanning it, see `base.get_meta_vartype`.
+    mergeable : boolean
+        Whether or not to plan only summaries which can be merged with the ones of other data.
+        The statistics of the numerical and date variables are then derived later from
+        a t-digest (under the 'digest' key, see `derive_1d`), instead of being planned.
+        It is the case with a partition cache, since the summaries of the partitions which
+        depend on the ones of the whole data (the histograms...) could not be reused.
 
     Returns
     -------
-    string
-        The name of the variable (data).
     dict
-        The description of the variable as a dict.
+        The lazy summaries, to be passed to `finalize_1d` once computed.
     """
+    approx_distinct = kwargs.get('approx_distinct', True)
+    top_k = kwargs.get('top_k')
+    partition_cache = kwargs.get('partition_cache')
+    mergeable = mergeable or partition_cache is not None
 
-    # Replace infinite values with NaNs to avoid issues with
-    # histograms later.
-    #data = data.replace(to_replace=[np.inf, np.NINF, np.PINF], value=np.nan)
-    #data.map_partitions(pandas.DataFrame.replace, to_replace=[np.inf, np.NINF, np.PINF], value=np.nan)
+    plan = {'dtype': data.dtype,
+            'counts': base.STATS_CACHE.reduce(data, accumulators.Counts, partition_cache)}
+    if vartype == base.S_TYPE_UNSUPPORTED:
+        # Nothing else can be computed
+        plan['distinct'] = plan['frequencies'] = accumulators.Unsupported('Not supported mixed type')
+        return plan
+
+    # The distinct count is estimated only when the values are not all counted anyway
+    if not approx_distinct or top_k is None:
+        value_counts = base.STATS_CACHE.reduce(data, accumulators.ValueCounts, partition_cache)
+        plan['distinct'] = value_counts
+    else:
+        plan['distinct'] = base.STATS_CACHE.reduce(data, accumulators.HyperLogLog, partition_cache)
+    if top_k is None:
+        plan['frequencies'] = value_counts
+    else:
+        plan['frequencies'] = base.STATS_CACHE.reduce(data, accumulators.FrequentValues, partition_cache, capacity=top_k)
 
+    if pd.api.types.is_bool_dtype(data.dtype):
+        plan['moments'] = base.STATS_CACHE.reduce(data, accumulators.Moments, partition_cache)
+    elif mergeable and (pd.api.types.is_numeric_dtype(data.dtype) or pd.api.types.is_datetime64_dtype(data.dtype)):
+        if pd.api.types.is_numeric_dtype(data.dtype):
+            plan['moments'] = base.STATS_CACHE.reduce(data, accumulators.Moments, partition_cache)
+        else:
+            plan['extremes'] = base.STATS_CACHE.reduce(data, accumulators.Extremes, partition_cache)
+        plan['digest'] = base.STATS_CACHE.reduce(data, accumulators.TDigest, partition_cache,
+                                                 compression=kwargs.get('quantile_compression', 100))
+    elif pd.api.types.is_numeric_dtype(data.dtype):
+        # Also used if the variable turns out to be boolean
+        plan['numeric'] = describe_numeric_1d(data, **kwargs)
+        plan['moments'] = plan['numeric']['moments']
+    elif pd.api.types.is_datetime64_dtype(data.dtype):
+        plan['date'] = describe_date_1d(data, **kwargs)
 
-    result = dict()
+    return plan
 
-    vartype = base.get_vartype(data)
+def derive_1d(summary, **kwargs):
+    """Derive the statistics of a numerical or date variable from its mergeable summaries.
 
-    if vartype == base.S_TYPE_UNSUPPORTED:
-        result.update(describe_unsupported(data))
+    The percentiles, the mean absolute deviation and the bin counts are estimated
+    from the t-digest, they are exact when the digest keeps the data exactly.
+
+    Parameters
+    ----------
+    summary : dict
+        The computed summaries of the variable, see `plan_1d` with `mergeable`.
+
+    Returns
+    -------
+    dict
+        The summaries with the statistics, to be passed to `finalize_1d`.
+    """
+    summary = dict(summary)
+    digest = summary.get('digest')
+    if 'moments' in summary and digest is not None:
+        moments = summary['moments']
+        edges = accumulators.histogram_edges(moments.finite_minimum, moments.finite_maximum, kwargs.get('bins', 10))
+        summary['numeric'] = numeric_stats(moments, digest.quantiles(PERCENTILES),
+                                           digest.mean_absolute_deviation(moments.mean), digest.histogram(edges))
+    elif 'extremes' in summary and digest is not None:
+        extremes = summary['extremes']
+        edges = accumulators.histogram_edges(extremes.minimum, extremes.maximum, kwargs.get('bins', 10))
+        summary['date'] = date_stats(extremes, digest.histogram(edges, is_date=True))
+    return summary
+
+def finalize_1d(summary, **kwargs):
+    """Describe a variable from its computed summaries.
+
+    The type of the variable is inferred and the description is
+    different according to it. However a set of common stats is also computed.
+
+    Parameters
+    ----------
+    summary : dict
+        The computed summaries of the variable, see `plan_1d`.
+
+    Returns
+    -------
+    dict
+        The description of the variable as a dict.
+    """
+    result = dict()
+
+    if any(isinstance(summary[key], accumulators.Unsupported) for key in ('distinct', 'frequencies')):
+        result.update(describe_unsupported(summary))
+        return result
+
+    vartype = base.infer_vartype(summary['dtype'], summary['distinct'].count(), summary['counts'].size,
+                                 summary['distinct'].relative_error)
+    result.update(describe_supported(summary, **kwargs))
+
+    if vartype == base.S_TYPE_CONST:
+        result.update(describe_constant_1d(summary))
+    elif vartype == base.TYPE_BOOL:
+        result.update(describe_boolean_1d(summary, **kwargs))
+    elif vartype == base.TYPE_NUM:
+        stats = dict(summary['numeric'])
+        del stats['moments']
+        result.update(stats)
+    elif vartype == base.TYPE_DATE:
+        result.update(summary['date'])
+    elif vartype == base.S_TYPE_UNIQUE:
+        result.update(describe_unique_1d(summary))
     else:
-        result.update(describe_supported(data))
-
-        if vartype == base.S_TYPE_CONST:
-            result.update(describe_constant_1d(data))
-        elif vartype == base.TYPE_BOOL:
-            result.update(describe_boolean_1d(data))
-        elif vartype == base.TYPE_NUM:
-            result.update(describe_numeric_1d(data, **kwargs))
-        elif vartype == base.TYPE_DATE:
-            result.update(describe_date_1d(data))
-        elif vartype == base.S_TYPE_UNIQUE:
-            result.update(describe_unique_1d(data))
+        # TYPE_CAT
+        result.update(describe_categorical_1d(summary, **kwargs))
+
+    return result
+
+def plan_distinct_rows(df, approx=False, partition_cache=None, n_buckets=None):
+    """Plan the count of the distinct rows of a DataFrame, from 64 bits hashes of the rows.
+
+    Only the hashes leave the partitions (8 bytes per row), the rows are never shuffled.
+    The exact count splits the hashes in `n_buckets` buckets by value and reduces the
+    distinct hashes of each bucket separately, so that no task holds more than the distinct
+    hashes of a bucket. The approximate count reduces HyperLogLog sketches instead (see
+    `accumulators.ApproxDistinctRows`), whose memory is bounded.
+
+    Parameters
+    ----------
+    df : DataFrame
+        The hashable columns of the dataset.
+    approx : boolean
+        Whether or not to estimate the count with a HyperLogLog sketch.
+    partition_cache : PartitionCache
+        On-disk cache of the summaries of the partitions, see `describe`.
+    n_buckets : int
+        The number of buckets of the exact count,
+        by default `DUPLICATE_BUCKETS` or the number of partitions if it is smaller.
+
+    Returns
+    -------
+    list
+        The lazy accumulators, the sum of their counts is the number of distinct rows.
+    """
+    if approx:
+        return [base.STATS_CACHE.reduce(df, accumulators.ApproxDistinctRows, partition_cache)]
+    n_buckets = n_buckets or min(DUPLICATE_BUCKETS, df.npartitions)
+    hashes = df.map_partitions(accumulators.row_hashes,
+                               meta=pd.Series([], dtype=np.uint64, name=tuple(df.columns)))
+    return [base.STATS_CACHE.reduce(hashes, accumulators.DistinctRows, partition_cache, bucket=bucket,
+                                    n_buckets=n_buckets)
+            for bucket in range(n_buckets)]
+
+def plan_correlations(df, partition_cache=None, block_size=CORRELATION_BLOCK_SIZE):
+    """Plan the co-moments of the numerical variables, from which the Pearson correlations are derived.
+
+    The correlation matrix is tiled in blocks of `block_size` columns, the co-moments of
+    each pair of blocks (on and above the diagonal) are summarized separately so that no
+    task handles all the columns of a wide dataset. They are computed in the same pass as
+    the other summaries.
+
+    Parameters
+    ----------
+    df : DataFrame
+        The dataset.
+    partition_cache : PartitionCache
+        On-disk cache of the summaries of the partitions, see `describe`.
+    block_size : int
+        The number of columns per block.
+
+    Returns
+    -------
+    list
+        The `CoMoments` of each pair of blocks (lazy).
+    """
+    columns = list(df._meta._get_numeric_data().columns)
+    blocks = [columns[i:i + block_size] for i in range(0, len(columns), block_size)]
+    plan = []
+    for i, rows in enumerate(blocks):
+        for block in blocks[i:]:
+            data = df[rows] if block is rows else df[rows + block]
+            plan.append(base.STATS_CACHE.reduce(data, accumulators.CoMoments, partition_cache, rows=rows,
+                                                columns=block))
+    return plan
+
+def _approximate_ranks(partition, digests):
+    """Replace the values of a partition by their ranks estimated by the quantile sketches of its columns."""
+    ranks = pd.DataFrame(index=partition.index)
+    for col in partition.columns:
+        digest = digests[col]
+        if isinstance(digest, accumulators.Unsupported):
+            ranks[col] = np.nan
         else:
-            # TYPE_CAT
-            result.update(describe_categorical_1d(data))
+            ranks[col] = digest.ranks(partition[col].values)
+    return ranks
 
+def plan_spearman_correlations(df, digests, block_size=CORRELATION_BLOCK_SIZE):
+    """Plan the co-moments of the ranks of the numerical variables, from which the Spearman correlations are derived.
+
+    The ranks are estimated by the quantile sketches of the variables (t-digests, see
+    `accumulators.TDigest.ranks`) which must be computed first, since the ranks of a partition
+    depend on all the data. Then the co-moments of the ranks are planned like the Pearson
+    ones (see `plan_correlations`). So no variable is sorted: the cost is a quantile sketch
+    and a Pearson correlation. The correlations are exact when the sketches keep the data
+    exactly and there are no missing values, otherwise the ranks are approximate and computed
+    on all the values of each variable, not pairwise.
+
+    Parameters
+    ----------
+    df : DataFrame
+        The dataset.
+    digests : dict
+        The computed `TDigest` of each numerical variable.
+    block_size : int
+        The number of columns per block.
+
+    Returns
+    -------
+    list
+        The `CoMoments` of the ranks of each pair of blocks (lazy).
+    """
+    columns = list(digests)
+    ranks = df[columns].map_partitions(_approximate_ranks, digests, meta=df[columns]._meta.astype(np.float64))
+    return plan_correlations(ranks, block_size=block_size)
+
+def categorical_levels(summaries, n_levels=20):
+    """Find the categorical variables and their most frequent values from their computed summaries.
+
+    Parameters
+    ----------
+    summaries : dict
+        The computed summaries of the variables, see `plan_1d`.
+    n_levels : int
+        The maximum number of values kept per variable.
+
+    Returns
+    -------
+    dict
+        The most frequent values of each categorical (`TYPE_CAT`) variable.
+    """
+    levels = dict()
+    for col, summary in summaries.items():
+        if any(isinstance(summary[key], accumulators.Unsupported) for key in ('distinct', 'frequencies')):
+            continue
+        vartype = base.infer_vartype(summary['dtype'], summary['distinct'].count(), summary['counts'].size,
+                                     summary['distinct'].relative_error)
+        if vartype == base.TYPE_CAT:
+            levels[col] = list(summary['frequencies'].frequencies().index[:n_levels])
+    return levels
+
+def pearson_correlations(comoments):
+    """Assemble the Pearson correlation matrix from the co-moments of the pairs of blocks.
+
+    Parameters
+    ----------
+    comoments : list
+        The computed `CoMoments` of the blocks on and above the diagonal, see `plan_correlations`.
+
+    Returns
+    -------
+    DataFrame
+        The correlation matrix of the numerical variables.
+    """
+    columns = [col for block in comoments if block.rows == block.columns for col in block.columns]
+    corr = pd.DataFrame(np.nan, index=columns, columns=columns)
+    for block in comoments:
+        values = block.correlations()
+        corr.loc[block.rows, block.columns] = values.values
+        corr.loc[block.columns, block.rows] = values.values.T
+    return corr
+
+def correlated_variables(corr, threshold=0.9, overrides=None):
+    """Choose the variables to reject because they are correlated with other variables.
+
+    The pairs whose correlation is above the threshold are found with a mask of the matrix.
+    Then the variables are rejected greedily: the variable correlated with the most remaining
+    variables is rejected first (the last one in case of a tie), until no pair of remaining
+    variables is correlated. So if x ~ y and y ~ z but not x ~ z, only y is rejected.
+
+    Parameters
+    ----------
+    corr : DataFrame
+        The (symmetric) correlation matrix.
+    threshold : float
+        Threshold to determine if a pair of variables is correlated.
+    overrides : list
+        Variables which are never rejected.
+
+    Returns
+    -------
+    dict
+        For each rejected variable, the kept variable it is the most correlated with and
+        their correlation (or the most correlated variable if they were all rejected).
+    """
+    columns = list(corr.columns)
+    values = corr.values.astype(np.float64)
+    with np.errstate(invalid='ignore'):
+        correlated = values > threshold
+    np.fill_diagonal(correlated, False)
+    correlated |= correlated.T
+
+    degrees = correlated.sum(axis=1)
+    candidates = ~np.isin(columns, list(overrides or []))
+    rejected = np.zeros(len(columns), dtype=bool)
+    while True:
+        scores = np.where(candidates & ~rejected, degrees, 0)
+        if len(scores) == 0 or scores.max() == 0:
+            break
+        # The last of the variables with the most correlations
+        i = len(scores) - 1 - np.argmax(scores[::-1])
+        rejected[i] = True
+        degrees -= correlated[:, i]
+        degrees[i] = 0
+
+    result = dict()
+    for i in np.flatnonzero(rejected):
+        others = correlated[i] & ~rejected
+        if not others.any():
+            others = correlated[i]
+        j = np.flatnonzero(others)[np.argmax(values[i, others])]
+        result[columns[i]] = (columns[j], values[i, j])
     return result
 
-def multiprocess_func(x, **kwargs):
-    return x[0], describe_1d(x[1], **kwargs)
+def confidence_intervals(desc, n, confidence=0.95):
+    """Compute the confidence intervals of the statistics of a variable described from a sample.
+
+    The proportions get Wilson score intervals, the mean a normal interval and the
+    standard deviation the chi-squared interval of normally distributed data.
+    The rows are assumed to be drawn independently: when whole partitions are sampled
+    from ordered data the actual error is larger. The proportion of unique values of
+    a sample overestimates the one of the data, only its sampling error is covered.
+
+    Parameters
+    ----------
+    desc : dict
+        The description of the variable, see `finalize_1d`.
+    n : int
+        The number of rows of the sample.
+    confidence : float
+        The confidence level of the intervals.
+        The default is 0.95.
+
+    Returns
+    -------
+    dict
+        The bounds of the intervals under the '<stat>_lower' and '<stat>_upper' keys,
+        for the p_missing, p_zeros, p_unique, mean and std statistics.
+    """
+    # scipy.stats is slow to import, it is only needed for the intervals
+    import scipy.stats
+    z = scipy.stats.norm.ppf(0.5 + confidence / 2)
+    intervals = dict()
+    for key in ('p_missing', 'p_zeros', 'p_unique'):
+        if key in desc and n > 0 and not pd.isnull(desc[key]):
+            p = desc[key]
+            center = (p + z ** 2 / (2 * n)) / (1 + z ** 2 / n)
+            half = z / (1 + z ** 2 / n) * np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2))
+            # The interval holds the proportion, up to the rounding errors
+            intervals[key + '_lower'], intervals[key + '_upper'] = min(center - half, p), max(center + half, p)
+
+    count = desc.get('count', 0)
+    if desc.get('type') == base.TYPE_NUM and count > 1:
+        half = z * desc['std'] / np.sqrt(count)
+        intervals['mean_lower'], intervals['mean_upper'] = desc['mean'] - half, desc['mean'] + half
+        chi2 = scipy.stats.chi2.ppf([0.5 + confidence / 2, 0.5 - confidence / 2], count - 1)
+        intervals['std_lower'], intervals['std_upper'] = desc['std'] * np.sqrt((count - 1) / chi2)
+
+    return intervals
+
+@base.planning
+def describe_1d(data, **kwargs):
+    """Compute summary statistics of a variable (a Series).
+
+    The description is different according to the type of the variable.
+    However a set of common stats is also computed.
 
-def describe(df, bins=10, check_correlation=True, correlation_threshold=0.9, correlation_overrides=None, check_recoded=False, pool_size=multiprocessing.cpu_count(), **kwargs):
+    Parameters
+    ----------
+    series : Series
+        The variable to describe.
+
+    Returns
+    -------
+    dict
+        The description of the variable as a dict.
+    """
+    sample = base.sniff(data) if data.dtype == object else None
+    plan = plan_1d(data, base.get_meta_vartype(data.dtype, sample), **kwargs)
+    summary = base.STATS_CACHE.compute(plan, optimize_graph=False)[0]
+    return finalize_1d(derive_1d(summary, **kwargs), **kwargs)
+
+def meta_vartypes(df):
+    """Infer the types of the variables of a DataFrame known before scanning it, see `base.get_meta_vartype`.
+
+    Only the first partition is read, to sniff the object variables.
+
+    Parameters
+    ----------
+    df : DataFrame
+        The data to profile.
+
+    Returns
+    -------
+    dict
+        The type of each variable, `None` if it depends on the distinct count.
+    """
+    object_columns = [col for col in df.columns if df[col].dtype == object]
+    sample = base.sniff(df[object_columns]) if object_columns else pd.DataFrame()
+    return {col: base.get_meta_vartype(df[col].dtype, sample[col] if col in sample else None) for col in df.columns}
+
+@base.planning
+def describe(df, bins=10, check_correlation=True, correlation_threshold=0.9, correlation_overrides=None, check_recoded=False, pool_size=multiprocessing.cpu_count(), quantile_sketch=False, quantile_compression=100, approx_distinct=True, top_k=None, partition_cache=None, parquet_path=None, sample_fraction=None, max_rows=None, random_state=None, confidence=0.95, time_budget=None, spearman=False, kendall_rows=None, cramers_v=False, cramers_levels=20, approx_duplicates=False, renderer='png', **kwargs):
     """Generates a dict containing summary statistics for a given dataset stored as a pandas `DataFrame`.
 
     Used has is it will output its content as an HTML report in a Jupyter notebook.
@@ -321,13 +772,85 @@ def describe(df, bins=10, check_correlation=True, correlation_threshold=0.9, cor
         Variable names not to be rejected because they are correlated.
         There is no variable in the list (`None`) by default.
     check_recoded : boolean
-        Whether or not to check recoded correlation (memory heavy feature).
-        Since it's an expensive computation it can be activated for small datasets.
-        `check_correlation` must be true to disable this check.
+        Whether or not to check recoded correlation, that is categorical variables having a
+        one-to-one mapping between their values (see `accumulators.RowGroups`). It is computed
+        in the same pass, the memory grows with the number of distinct values of the variables.
+        `check_correlation` must be true to enable this check.
         It's `False` by default.
     pool_size : int
-        Number of workers in thread pool
+        Number of processes rendering the plots (see `plot.render`).
         The default is equal to the number of CPU.
+    quantile_sketch : boolean
+        Whether or not to compute the percentiles with a mergeable quantile sketch (t-digest).
+        All the percentiles are then answered by a single sketch built once per partition.
+        It's `False` by default.
+    quantile_compression : int
+        Accuracy of the quantile sketch, the rank error is about `1 / quantile_compression`.
+        The default is 100.
+    approx_distinct : boolean
+        Whether or not to estimate the distinct counts with a HyperLogLog sketch instead of value counts.
+        The estimate is exact up to 4096 distinct values, then its relative error is about 0.8%.
+        It only applies with `top_k`, otherwise all the values are counted and so are the distinct ones.
+        It's `True` by default.
+    top_k : int
+        Number of values kept in the frequency tables, estimated with a heavy hitters sketch
+        so that the memory stays bounded whatever the number of distinct values.
+        The extreme values and their counts are kept as well.
+        The default (`None`) keeps the exact counts of all values.
+    partition_cache : PartitionCache
+        On-disk cache of the summaries of the partitions (see `base.PartitionCache`), so that
+        profiling again the dataset after some partitions changed only reads these partitions.
+        The percentiles, mean absolute deviations and histograms are then estimated from a
+        t-digest (see `quantile_compression`), like the ones of `ProfileState`.
+        There is no cache (`None`) by default.
+    parquet_path : str or list
+        The files of the dataset if it was read by `dd.read_parquet` (without filters).
+        The extrema found in their footers are used to compute the histograms in the same
+        pass as the other statistics, see `parquet.footer_statistics`. pyarrow is needed.
+        The default is `None`.
+    sample_fraction : float
+        Fraction of the partitions profiled, drawn at random (see `base.sample_partitions`).
+        The proportions and moments then come with confidence intervals.
+        All the partitions are profiled (`None`) by default.
+    max_rows : int
+        Maximum number of rows profiled, sampled uniformly inside the profiled partitions.
+        There is no maximum (`None`) by default.
+    random_state : int
+        Seed of the sampling, drawn at random (`None`) by default.
+    confidence : float
+        Confidence level of the intervals given when the data is sampled, see `confidence_intervals`.
+        The default is 0.95.
+    time_budget : float
+        Time budget in seconds. The partitions are then summarized in random order with
+        mergeable accumulators (see `state.profile_within`), by batches of `pool_size`
+        partitions, until the budget runs out. The statistics merged so far are returned,
+        with the fraction of the partitions covered in table['coverage'] and confidence
+        intervals if not all of them were covered. The quantiles and the duplicates are then
+        always estimated by sketches, and the options needing another pass over the data
+        (`check_recoded`, `parquet_path`, `spearman`, `kendall_rows`, `cramers_v`) are not
+        supported. There is no budget (`None`) by default.
+    spearman : boolean
+        Whether or not to compute the Spearman correlations of the numerical variables, from
+        their ranks estimated by quantile sketches (see `plan_spearman_correlations`).
+        The sketches take a pass of their own. It's `False` by default.
+    kendall_rows : int
+        Number of rows sampled (see `base.sample_partitions`) to compute the Kendall
+        correlations of the numerical variables. They are not computed (`None`) by default.
+    cramers_v : boolean
+        Whether or not to compute the association matrix (bias corrected Cramér's V) of the
+        categorical variables, from their contingency tables (see `accumulators.Contingency`).
+        The categorical variables are found in a pass of their own. It's `False` by default.
+    cramers_levels : int
+        Number of values per categorical variable in the contingency tables, the most frequent
+        ones, the others are counted together. The default is 20.
+    approx_duplicates : boolean
+        Whether or not to estimate the number of duplicate rows with a HyperLogLog sketch of
+        the hashes of the rows, in bounded memory. Otherwise the distinct hashes are counted
+        exactly in buckets (see `plan_distinct_rows`). It's `False` by default.
+    renderer : str
+        How the plots are drawn: 'png' images rendered by matplotlib, or 'svg' markup
+        drawn from the bin counts without matplotlib (see `dask_profiling.svg`), which
+        is much faster and lighter. The default is 'png'.
 
     Returns
     -------
@@ -336,6 +859,8 @@ def describe(df, bins=10, check_correlation=True, correlation_threshold=0.9, cor
             * table: general statistics on the dataset
             * variables: summary statistics for each variable
             * freq: frequency table
+            * correlations: the correlation matrices by method (pearson, spearman, kendall, cramers)
+            * correlation_plots: the images of the non-empty matrices, by '<method>_matrix' key
 
     Notes:
     ------
@@ -348,121 +873,250 @@ def describe(df, bins=10, check_correlation=True, correlation_threshold=0.9, cor
     # if (len(df) == 0):
     #     raise ValueError("df can not be empty")
 
-    try:
-        # reset matplotlib style before use
-        # Fails in matplotlib 1.4.x so plot might look bad
-        matplotlib.style.use("default")
-    except:
-        pass
-
-    try:
-        # Ignore FutureWarning
-        from pandas.plotting import register_matplotlib_converters
-        register_matplotlib_converters()
-    except:
-        pass
-
-    matplotlib.style.use(resource_filename(__name__, "dask_profiling.mplstyle"))
-
-    # Clearing the cache before computing stats
-    base.clear_cache()
-
     # TODO: Improve this check, it'd take a LONG time this way
     # if not pd.Index(np.arange(0, len(df))).equals(df.index.compute()):
     #     # Treat index as any other column
     #     df = df.reset_index()
-    if not isinstance(df.index.head(), pd.RangeIndex):
+    # The type of the index is known from the metadata, without reading any partition
+    if not isinstance(df._meta.index, pd.RangeIndex):
         df = df.reset_index()
 
-    kwargs.update({'bins': bins})
-    # Describe all variables in a univariate way
-    # if pool_size == 1:
-    #     local_multiprocess_func = partial(multiprocess_func, **kwargs)
-    #     ldesc = {col: s for col, s in map(local_multiprocess_func, df.iteritems())}
-    # else:
-    #     pool = multiprocessing.Pool(pool_size)
-    #     local_multiprocess_func = partial(multiprocess_func, **kwargs)
-    #     ldesc = {col: s for col, s in pool.map(local_multiprocess_func, df.iteritems())}
-    #     pool.close()
-
-    ldesc = dict()
-    for col in df.columns:
-        desc = describe_1d(df[col])
-        ldesc[col] = desc
-
-    # Get correlations
-    dfcorrPear = df.corr(method="pearson")
-    # Spearman's correlation has not been implemented yet
-    # dfcorrSpear = df.corr(method="spearman")
+    sampled = sample_fraction is not None or max_rows is not None
+    if partition_cache is not None and (sampled or time_budget is not None):
+        # Its keys are the positions of the partitions in the dataset
+        raise ValueError("The partition cache can not be used with a sample or a time budget")
+    if time_budget is not None:
+        # The merged state only holds mergeable summaries, see `ProfileState`
+        unsupported = [name for name, value in [('check_recoded', check_recoded), ('parquet_path', parquet_path),
+                                                ('spearman', spearman), ('kendall_rows', kendall_rows),
+                                                ('cramers_v', cramers_v)] if value]
+        if unsupported:
+            raise ValueError("The options {} can not be used with a time budget".format(', '.join(unsupported)))
+    if sampled:
+        df = base.sample_partitions(df, sample_fraction, max_rows, random_state)
+
+    if time_budget is not None:
+        # Imported here since the state is described by this module
+        from dask_profiling.state import profile_within
+        state, coverage = profile_within(df, time_budget, pool_size, random_state, bins=bins,
+                                         check_correlation=check_correlation,
+                                         correlation_threshold=correlation_threshold,
+                                         correlation_overrides=correlation_overrides,
+                                         quantile_compression=quantile_compression, approx_distinct=approx_distinct,
+                                         top_k=top_k, renderer=renderer, **kwargs)
+        description = state.describe(confidence if sampled or coverage < 1 else None)
+        description['table']['coverage'] = coverage
+        return description
+
+    kwargs.update({'bins': bins, 'quantile_sketch': quantile_sketch, 'quantile_compression': quantile_compression,
+                   'approx_distinct': approx_distinct, 'top_k': top_k, 'partition_cache': partition_cache})
+    if parquet_path is not None:
+        _, footers = parquet.footer_statistics(parquet_path)
+        # Infinite extrema are not the range of the histogram, the finite ones are computed then
+        kwargs['extrema'] = {col: (footers.at[col, 'min'], footers.at[col, 'max'])
+                             for col in footers.index if not pd.isnull(footers.at[col, 'min'])
+                             and footers.at[col, 'min'] not in (np.inf, -np.inf)
+                             and footers.at[col, 'max'] not in (np.inf, -np.inf)}
+
+    # The types given by the dtypes and a sniff of the first partition are known before any scan
+    vartypes = meta_vartypes(df)
+
+    # The rank correlations and the associations need summaries of all the data beforehand. They are
+    # computed in a pass of their own, then taken from the cache by the plan (the percentiles, the frequencies...)
+    prepass = dict()
+    if spearman:
+        prepass['digests'] = {col: base.STATS_CACHE.reduce(df[col], accumulators.TDigest, partition_cache,
+                                                           compression=quantile_compression)
+                              for col in df._meta._get_numeric_data().columns}
+    if cramers_v:
+        prepass['categorical'] = {col: plan_1d(df[col], vartypes[col], **kwargs)
+                                  for col in df.columns if vartypes[col] is None}
+    if prepass:
+        prepass, = base.STATS_CACHE.compute(prepass, optimize_graph=False)
+
+    spearman_comoments = plan_spearman_correlations(df, prepass['digests']) if spearman else []
+    contingency = None
+    if cramers_v:
+        levels = categorical_levels(prepass['categorical'], cramers_levels)
+        if len(levels) > 1:
+            contingency = base.STATS_CACHE.reduce(df[list(levels)], accumulators.Contingency, partition_cache,
+                                                  levels=levels)
+
+    # Plan everything first, then compute it in a single graph so that the data is read once.
+    # The graph must not be optimized per collection, otherwise the partitions are not shared.
+    plans = {col: plan_1d(df[col], vartypes[col], **kwargs) for col in df.columns}
+
+    # Get correlations, from co-moments computed in the same pass
+    comoments = plan_correlations(df, partition_cache)
+    # Kendall's correlation needs all the pairs of rows, it is computed on a sample
+    kendall_sample = None
+    if kendall_rows is not None:
+        numeric_columns = list(df._meta._get_numeric_data().columns)
+        kendall_sample = base.STATS_CACHE.lazy(base.sample_partitions(df[numeric_columns], max_rows=kendall_rows,
+                                                                      random_state=random_state))
+
+    # The recoded variables are found by comparing how the values of the possibly categorical variables group the rows
+    row_groups = None
+    if check_correlation and check_recoded:
+        categorical_columns = [col for col in df.columns if vartypes[col] is None]
+        if len(categorical_columns) > 1:
+            row_groups = base.STATS_CACHE.reduce(df[categorical_columns], accumulators.RowGroups, partition_cache)
+
+    # General statistics
+    table = base.STATS_CACHE.reduce(df, accumulators.TableCounts, partition_cache)
+    # The duplicates are counted from the hashes of the rows, the unsupported columns are left out
+    hashed_columns = [col for col in df.columns if vartypes[col] != base.S_TYPE_UNSUPPORTED]
+    distinct_rows = plan_distinct_rows(df[hashed_columns], approx_duplicates, partition_cache)
+
+    # The statistics computed by the previous profiles of the same data are taken from the cache
+    plans, table, comoments, spearman_comoments, kendall_sample, contingency, row_groups, distinct_rows = \
+        base.STATS_CACHE.compute(plans, table, comoments, spearman_comoments, kendall_sample, contingency, row_groups,
+                                 distinct_rows, optimize_graph=False)
+    # The variables planned with mergeable summaries (with a partition cache) are derived from them
+    plans = {col: derive_1d(summary, **kwargs) for col, summary in plans.items()}
+    dfcorrPear = pearson_correlations(comoments)
+    dfcorrSpear = pearson_correlations(spearman_comoments) if spearman else None
+    dfcorrKendall = kendall_sample.corr(method="kendall") if kendall_sample is not None else None
+    dfcorrCramers = contingency.cramers_v() if contingency is not None else None
+
+    return describe_table(plans, table.size, table.memory, dfcorrPear, sum(part.count() for part in distinct_rows),
+                          check_correlation=check_correlation, correlation_threshold=correlation_threshold,
+                          correlation_overrides=correlation_overrides, confidence=confidence if sampled else None,
+                          dfcorrSpear=dfcorrSpear, dfcorrKendall=dfcorrKendall, dfcorrCramers=dfcorrCramers,
+                          row_groups=row_groups, pool_size=pool_size, renderer=renderer, **kwargs)
+
+def describe_table(summaries, n, memsize, dfcorrPear, n_distinct_rows, check_correlation=True, correlation_threshold=0.9,
+                   correlation_overrides=None, confidence=None, dfcorrSpear=None, dfcorrKendall=None,
+                   dfcorrCramers=None, row_groups=None, pool_size=1, renderer='png', **kwargs):
+    """Describe a dataset from the computed summaries of its variables and of its rows.
+
+    The variables are described with `finalize_1d`, the histograms are rendered and the
+    general statistics are derived. See `describe` for the parameters not listed here.
+
+    Parameters
+    ----------
+    summaries : dict
+        The computed summaries of each variable, see `plan_1d`.
+    n : int
+        The number of rows.
+    memsize : int
+        The memory usage in bytes, index included.
+    dfcorrPear : DataFrame
+        The Pearson correlation matrix of the numerical variables.
+    n_distinct_rows : int
+        The number of distinct rows, which may be approximate (see `plan_distinct_rows`).
+    confidence : float
+        Confidence level of the intervals of the statistics if the dataset is a sample,
+        see `confidence_intervals`. There are no intervals (`None`) by default.
+    dfcorrSpear, dfcorrKendall, dfcorrCramers : DataFrame
+        The Spearman and Kendall correlation matrices and the Cramér's V matrix, if they were computed.
+    row_groups : RowGroups
+        How the values of the possibly categorical variables group the rows, to find the
+        recoded variables. They are not checked (`None`) by default.
+    pool_size : int
+        Number of processes rendering the histograms, see `plot.render`. The default is 1.
+    renderer : str
+        How the histograms are drawn, 'png' (the default) or 'svg'.
+
+    Returns
+    -------
+    dict
+        The description of the dataset, see `describe`.
+
+    Raises
+    ------
+    ValueError
+        If the renderer is unknown.
+    """
+    if renderer not in ('png', 'svg'):
+        raise ValueError("The renderer must be 'png' or 'svg'")
+    if renderer == 'png':
+        # matplotlib is only imported to render images
+        import dask_profiling.plot as plot
+        plot.use_style()
+
+    ldesc = {col: finalize_1d(summaries[col], **kwargs) for col in summaries}
+    if confidence is not None:
+        for desc in ldesc.values():
+            desc.update(confidence_intervals(desc, n, confidence))
 
     # Check correlations between variable
     if check_correlation is True:
-        ''' TODO: corr(x,y) > 0.9 and corr(y,z) > 0.9 does not imply corr(x,z) > 0.9
-        If x~y and y~z but not x~z, it would be better to delete only y
-        Better way would be to find out which variable causes the highest increase in multicollinearity.
-        '''
-        corr = dfcorrPear.copy()
-        for x, corr_x in corr.iterrows():
-            if correlation_overrides and x in correlation_overrides:
-                continue
-
-            for y, corr in corr_x.iteritems():
-                if x == y: break
-
-                if corr > correlation_threshold:
-                    ldesc[x] = {
-                        'type': 'CORR',
-                        'correlation_var': y,
-                        'correlation': corr
-                    }
-
-        # TODO: implement crosstab for dask or find another way to check the recoding. 
-        # Perhaps, some approahc where we don't need to compare all the combinations 
-        # between the categories
-        # if check_recoded:
-        #     categorical_variables = [(df[col].name, df[col]) for col in df.columns if base.get_vartype(df[col])=='CAT']
-        #     for (name1, data1), (name2, data2) in itertools.combinations(categorical_variables, 2):
-        #         if correlation_overrides and name1 in correlation_overrides:
-        #             continue
-
-        #         confusion_matrix=pd.crosstab(data1,data2)
-        #         if confusion_matrix.values.diagonal().sum() == len(df):
-        #             ldesc[name1] = pd.Series(['RECODED', name2], index=['type', 'correlation_var'])
-
-    # Convert ldesc to a DataFrame
-    # TODO: Beautify, as above
-    # names = []
-    # ldesc_indexes = sorted([x.index for x in ldesc.values()], key=len)
-    # for idxnames in ldesc_indexes:
-    #     for name in idxnames:
-    #         if name not in names:
-    #             names.append(name)
-    # variable_stats = pd.concat(ldesc, join_axes=pd.Index([names]), axis=1)
-    # variable_stats.columns.names = df.columns.names
-    variable_stats = pd.DataFrame.from_dict(compute(ldesc)[0])
+        correlated = correlated_variables(dfcorrPear, correlation_threshold, correlation_overrides)
+        for x, (y, corr) in correlated.items():
+            ldesc[x] = {
+                'type': 'CORR',
+                'correlation_var': y,
+                'correlation': corr
+            }
+
+        if row_groups is not None and not isinstance(row_groups, accumulators.Unsupported):
+            categorical_variables = [col for col in row_groups.groups if ldesc[col]['type'] == base.TYPE_CAT]
+            for x, y in row_groups.recoded(categorical_variables, correlation_overrides).items():
+                ldesc[x] = {
+                    'type': 'RECODED',
+                    'correlation_var': y
+                }
+
+    correlations = {'pearson': dfcorrPear}
+    if dfcorrSpear is not None:
+        correlations['spearman'] = dfcorrSpear
+    if dfcorrKendall is not None:
+        correlations['kendall'] = dfcorrKendall
+    if dfcorrCramers is not None:
+        correlations['cramers'] = dfcorrCramers
+
+    # Render the histograms from the bin counts, only these small arrays reach the client,
+    # with the correlation matrices of the report in the same batch
+    plotter = plot if renderer == 'png' else svg
+    plots = dict()
+    for col, desc in ldesc.items():
+        if 'histogram' in desc:
+            plots[col, 'mini_histogram'] = (plotter.mini_histogram, (desc['histogram'],))
+            plots[col, 'histogram'] = (plotter.histogram, (desc['histogram'],))
+    for method, corr in correlations.items():
+        if len(corr) > 0:
+            plots['{}_matrix'.format(method)] = (plotter.correlation_matrix,
+                                                 (corr, CORRELATION_TITLES.get(method, method)))
+    if renderer == 'png':
+        plots = plot.render(plots, pool_size)
+    else:
+        # Drawing the markup is cheaper than starting processes
+        plots = {key: func(*args) for key, (func, args) in plots.items()}
+    correlation_plots = dict()
+    for key, image in plots.items():
+        if isinstance(key, tuple):
+            ldesc[key[0]][key[1]] = image
+        else:
+            correlation_plots[key] = image
+
+    variable_stats = pd.DataFrame.from_dict(ldesc)
 
     # General statistics
     table_stats = {}
 
-    table_stats['n'] = delayed(len)(df)
-    table_stats['nvar'] = delayed(len)(df.columns)
+    table_stats['n'] = n
+    table_stats['nvar'] = len(summaries)
     table_stats['total_missing'] = variable_stats.loc['n_missing'].sum() / (table_stats['n'] * table_stats['nvar'])
-    unsupported_columns = variable_stats.transpose()[variable_stats.transpose().type != base.S_TYPE_UNSUPPORTED].index.tolist()
-    table_stats['n_duplicates'] = (delayed(len)(df[unsupported_columns].drop_duplicates()) - delayed(len)(df)) if len(unsupported_columns) > 0 else 0
+    supported_columns = variable_stats.transpose()[variable_stats.transpose().type != base.S_TYPE_UNSUPPORTED].index.tolist()
+    # The distinct count may be approximate
+    table_stats['n_duplicates'] = max(n - n_distinct_rows, 0) if len(supported_columns) > 0 and n > 0 else 0
 
-    memsize = df.memory_usage(index=True).sum()
-    table_stats, memsize = compute(table_stats, memsize)
     table_stats['memsize'] = formatters.fmt_bytesize(memsize)
     table_stats['recordsize'] = formatters.fmt_bytesize(memsize / table_stats['n'])
 
     table_stats.update({k: 0 for k in ("NUM", "DATE", "CONST", "CAT", "UNIQUE", "CORR", "RECODED", "BOOL", "UNSUPPORTED")})
     table_stats.update(dict(variable_stats.loc['type'].value_counts()))
     table_stats['REJECTED'] = table_stats['CONST'] + table_stats['CORR'] + table_stats['RECODED']
+    # The statistics are estimated from a sample of the dataset
+    table_stats['sampled'] = confidence is not None
+    # The correlation matrices are drawn like the histograms
+    table_stats['renderer'] = renderer
 
-    return compute({
+    return {
         'table': table_stats,
         'variables': variable_stats.T,
-        'freq': {k: (base.get_groupby_statistic(df[k])[0] if variable_stats[k].type != base.S_TYPE_UNSUPPORTED else None) for k in df.columns},
-        # 'correlations': {'pearson': dfcorrPear, 'spearman': dfcorrSpear}
-        'correlations': {'pearson': dfcorrPear}
-    })[0]
+        'freq': {k: (summaries[k]['frequencies'].frequencies() if variable_stats[k].type != base.S_TYPE_UNSUPPORTED else None) for k in summaries},
+        'correlations': correlations,
+        'correlation_plots': correlation_plots
+    }
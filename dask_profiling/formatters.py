@@ -40,6 +40,7 @@ value_formatters={
     u'p_zeros': fmt_percent,
     u'memorysize': fmt_bytesize,
     u'total_missing': fmt_percent,
+    u'coverage': fmt_percent,
     DEFAULT_FLOAT_FORMATTER: lambda v: str(float('{:.5g}'.format(v))).rstrip('0').rstrip('.')
     }
 
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""Statistics read from the footers of parquet files, without reading the data.
+
+The footers hold, for each row group, the number of rows and for each column
+the number of missing values and the extrema. They answer the overview of a
+parquet dataset in the time it takes to read a few kilobytes per file.
+
+pyarrow is needed to read the footers, it is imported on first use.
+"""
+import os
+import pandas as pd
+import dask_profiling.base as base
+import dask_profiling.accumulators as accumulators
+
+
+def parquet_files(path):
+    """List the data files of a parquet dataset.
+
+    Parameters
+    ----------
+    path : str or list
+        A file, a directory (searched recursively) or a list of files.
+
+    Returns
+    -------
+    list
+        The paths of the files, sorted.
+    """
+    if isinstance(path, (list, tuple)):
+        return list(path)
+    if not os.path.isdir(path):
+        return [path]
+    files = []
+    for root, dirs, names in os.walk(path):
+        # Hidden and metadata files (_metadata, _SUCCESS...) hold no rows
+        dirs[:] = [d for d in dirs if not d.startswith(('.', '_'))]
+        files.extend(os.path.join(root, name) for name in names if not name.startswith(('.', '_')))
+    return sorted(files)
+
+
+def _to_value(value):
+    """Convert a footer statistic to the type pandas uses."""
+    if hasattr(value, 'year') and hasattr(value, 'hour'):
+        return pd.Timestamp(value)
+    return value
+
+
+def footer_statistics(path):
+    """Aggregate the statistics of the row groups of a parquet dataset, per column.
+
+    A statistic is complete if every row group holds it. The extrema of the
+    string columns are not used since writers may truncate them.
+
+    Parameters
+    ----------
+    path : str or list
+        A file, a directory or a list of files.
+
+    Returns
+    -------
+    int
+        The number of rows.
+    DataFrame
+        Indexed by the (top level) columns, with the `n_missing`, `min` and `max`
+        columns, missing when the statistic is not complete.
+
+    Raises
+    ------
+    ImportError
+        If pyarrow is not installed.
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("pyarrow is needed to read the statistics of parquet files")
+
+    n = 0
+    stats = dict()
+    for file in parquet_files(path):
+        metadata = pq.ParquetFile(file).metadata
+        n += metadata.num_rows
+        for i in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i)
+            for j in range(row_group.num_columns):
+                column = row_group.column(j)
+                name = column.path_in_schema
+                if '.' in name:
+                    # Nested column
+                    continue
+                col_stats = stats.setdefault(name, {'n_missing': 0, 'min': None, 'max': None,
+                                                    'complete': True, 'extrema': column.physical_type != 'BYTE_ARRAY'})
+                statistics = column.statistics if column.is_stats_set else None
+                if statistics is None or statistics.null_count is None:
+                    col_stats['complete'] = col_stats['extrema'] = False
+                    continue
+                col_stats['n_missing'] += statistics.null_count
+                if statistics.null_count == row_group.num_rows:
+                    # Only missing values, no extrema
+                    continue
+                if not statistics.has_min_max:
+                    col_stats['extrema'] = False
+                elif col_stats['extrema']:
+                    minimum, maximum = _to_value(statistics.min), _to_value(statistics.max)
+                    if col_stats['min'] is None or minimum < col_stats['min']:
+                        col_stats['min'] = minimum
+                    if col_stats['max'] is None or maximum > col_stats['max']:
+                        col_stats['max'] = maximum
+
+    result = pd.DataFrame(index=list(stats), columns=['n_missing', 'min', 'max'], dtype=object)
+    for name, col_stats in stats.items():
+        if col_stats['complete']:
+            result.at[name, 'n_missing'] = col_stats['n_missing']
+        if col_stats['complete'] and col_stats['extrema']:
+            result.at[name, 'min'] = col_stats['min']
+            result.at[name, 'max'] = col_stats['max']
+    return n, result
+
+
+@base.planning
+def overview(df, path):
+    """Compute the overview of a parquet dataset, from the footers when their statistics are complete.
+
+    Only the variables whose statistics are not complete are scanned (all together),
+    the extrema are only given for the numerical and date variables.
+
+    Parameters
+    ----------
+    df : DataFrame
+        The dataset, as read by `dd.read_parquet(path)` (without filters).
+    path : str or list
+        The files of the dataset, see `footer_statistics`.
+
+    Returns
+    -------
+    dict
+        Containing the following keys:
+            * table: the number of rows (n) and of variables (nvar)
+            * variables: count, n_missing, p_missing, min, max and range of each variable
+    """
+    n, footers = footer_statistics(path)
+
+    lazy_counts, lazy_extremes = dict(), dict()
+    for col in df.columns:
+        if col not in footers.index or pd.isnull(footers.at[col, 'n_missing']):
+            lazy_counts[col] = base.STATS_CACHE.reduce(df[col], accumulators.Counts)
+        if base.get_meta_vartype(df[col].dtype) in (base.TYPE_NUM, base.TYPE_DATE) and \
+                (col not in footers.index or pd.isnull(footers.at[col, 'min'])):
+            lazy_extremes[col] = base.STATS_CACHE.reduce(df[col], accumulators.Extremes)
+    counts, extremes = base.STATS_CACHE.compute(lazy_counts, lazy_extremes, optimize_graph=False)
+
+    variables = dict()
+    for col in df.columns:
+        stats = dict()
+        n_missing = counts[col].size - counts[col].count if col in counts else footers.at[col, 'n_missing']
+        stats['n_missing'] = int(n_missing)
+        stats['count'] = n - stats['n_missing']
+        stats['p_missing'] = stats['n_missing'] * 1.0 / n if n > 0 else 0.0
+        if base.get_meta_vartype(df[col].dtype) in (base.TYPE_NUM, base.TYPE_DATE):
+            if col in extremes:
+                stats['min'], stats['max'] = extremes[col].minimum, extremes[col].maximum
+            else:
+                stats['min'], stats['max'] = footers.at[col, 'min'], footers.at[col, 'max']
+            stats['range'] = stats['max'] - stats['min']
+        variables[col] = stats
+
+    return {
+        'table': {'n': n, 'nvar': len(df.columns)},
+        'variables': pd.DataFrame.from_dict(variables, orient='index')
+    }
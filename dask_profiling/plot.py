@@ -3,19 +3,14 @@
 
 import base64
 from distutils.version import LooseVersion
-import dask_profiling.base as base
-import dask.array as da
-import dask.dataframe as dd
 import matplotlib
+import matplotlib.style
 import numpy as np
-# Fix #68, this call is not needed and brings side effects in some use cases
-# Backend name specifications are not case-sensitive; e.g., ‘GTKAgg’ and ‘gtkagg’ are equivalent.
-# See https://matplotlib.org/faq/usage_faq.html#what-is-a-backend
-BACKEND = matplotlib.get_backend()
-if matplotlib.get_backend().lower() != BACKEND.lower():
-    # If backend is not set properly a call to describe will hang
-    matplotlib.use(BACKEND)
-from matplotlib import pyplot as plt
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from matplotlib import dates as mdates
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 try:
     from StringIO import BytesIO
 except ImportError:
@@ -25,13 +20,49 @@ try:
 except ImportError:
     from urllib.parse import quote
 
-def _plot_histogram(series, bins=10, figsize=(6, 4), facecolor='#337ab7'):
-    """Plot an histogram from the data and return the AxesSubplot object.
+POOL_MIN_PLOTS = 20
+"""Int: Minimum number of plots to render them in a process pool, fewer are rendered in the current process"""
+
+def use_style():
+    """Set the matplotlib style of the plots of the report."""
+    try:
+        # reset matplotlib style before use
+        # Fails in matplotlib 1.4.x so plot might look bad
+        matplotlib.style.use("default")
+    except:
+        pass
+
+    try:
+        # Ignore FutureWarning
+        from pandas.plotting import register_matplotlib_converters
+        register_matplotlib_converters()
+    except:
+        pass
+
+    # pkg_resources is slow to import, it is only needed here
+    from pkg_resources import resource_filename
+    matplotlib.style.use(resource_filename(__name__, "dask_profiling.mplstyle"))
+
+def _new_figure(figsize=None):
+    """Create a figure drawn by the Agg backend, without the global state of pyplot."""
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+def _to_string(fig, **kwargs):
+    """Encode a figure as a PNG image in a string."""
+    imgdata = BytesIO()
+    fig.savefig(imgdata, format='png', **kwargs)
+    # TODO Think about writing this to disk instead of caching them in strings
+    return 'data:image/png;base64,' + quote(base64.b64encode(imgdata.getvalue()))
+
+def _plot_histogram(hist, figsize=(6, 4), facecolor='#337ab7'):
+    """Plot an histogram from precomputed bin counts and return the AxesSubplot object.
 
     Parameters
     ----------
-    series : Series
-        The data to plot
+    hist : Histogram
+        The bin counts and edges of the data to plot
     figsize : tuple
         The size of the figure (width, height) in inches, default (6,4)
     facecolor : str
@@ -42,53 +73,50 @@ def _plot_histogram(series, bins=10, figsize=(6, 4), facecolor='#337ab7'):
     matplotlib.AxesSubplot
         The plot.
     """
-    fig = plt.figure(figsize=figsize)
+    fig = _new_figure(figsize=figsize)
     plot = fig.add_subplot(111)
 
-    plot.hist(series.dropna().values, bins=bins, facecolor=facecolor)  # TODO: make da.histogram work
+    edges = hist.edges
+    if hist.is_date:
+        edges = mdates.date2num(pd.to_datetime(edges.astype(np.int64)).to_pydatetime())
+        plot.xaxis_date()
+    plot.hist(edges[:-1], bins=edges, weights=hist.counts, facecolor=facecolor)
 
     return plot
 
 
-def histogram(series, **kwargs):
+def histogram(hist, **kwargs):
     """Plot an histogram of the data.
 
     Parameters
     ----------
-    series: Series
-        The data to plot.
+    hist: Histogram
+        The bin counts of the data to plot.
 
     Returns
     -------
     str
         The resulting image encoded as a string.
     """
-    imgdata = BytesIO()
-    plot = _plot_histogram(series, **kwargs)
+    plot = _plot_histogram(hist, **kwargs)
     plot.figure.subplots_adjust(left=0.15, right=0.95, top=0.9, bottom=0.1, wspace=0, hspace=0)
-    plot.figure.savefig(imgdata)
-    imgdata.seek(0)
-    result_string = 'data:image/png;base64,' + quote(base64.b64encode(imgdata.getvalue()))
-    # TODO Think about writing this to disk instead of caching them in strings
-    plt.close(plot.figure)
-    return result_string
+    return _to_string(plot.figure)
 
 
-def mini_histogram(series, **kwargs):
+def mini_histogram(hist, **kwargs):
     """Plot a small (mini) histogram of the data.
 
     Parameters
     ----------
-    series: Series
-        The data to plot.
+    hist: Histogram
+        The bin counts of the data to plot.
 
     Returns
     -------
     str
         The resulting image encoded as a string.
     """
-    imgdata = BytesIO()
-    plot = _plot_histogram(series, figsize=(2, 0.75), **kwargs)
+    plot = _plot_histogram(hist, figsize=(2, 0.75), **kwargs)
     plot.axes.get_yaxis().set_visible(False)
 
     if LooseVersion(matplotlib.__version__) <= '1.5.9':
@@ -103,11 +131,7 @@ def mini_histogram(series, **kwargs):
     for tick in (xticks[0], xticks[-1]):
         tick.label.set_fontsize(8)
     plot.figure.subplots_adjust(left=0.15, right=0.85, top=1, bottom=0.35, wspace=0, hspace=0)
-    plot.figure.savefig(imgdata)
-    imgdata.seek(0)
-    result_string = 'data:image/png;base64,' + quote(base64.b64encode(imgdata.getvalue()))
-    plt.close(plot.figure)
-    return result_string
+    return _to_string(plot.figure)
 
 def correlation_matrix(corrdf, title, **kwargs):
     """Plot image of a matrix correlation.
@@ -121,19 +145,45 @@ def correlation_matrix(corrdf, title, **kwargs):
     -------
     str, The resulting image encoded as a string.
     """
-    imgdata = BytesIO()
-    fig_cor, axes_cor = plt.subplots(1, 1)
+    fig_cor = _new_figure()
+    axes_cor = fig_cor.add_subplot(111)
     labels = corrdf.columns
     matrix_image = axes_cor.imshow(corrdf, vmin=-1, vmax=1, interpolation="nearest", cmap='bwr')
-    plt.title(title, size=18)
-    plt.colorbar(matrix_image)
+    axes_cor.set_title(title, size=18)
+    fig_cor.colorbar(matrix_image, ax=axes_cor)
     axes_cor.set_xticks(np.arange(0, corrdf.shape[0], corrdf.shape[0] * 1.0 / len(labels)))
     axes_cor.set_yticks(np.arange(0, corrdf.shape[1], corrdf.shape[1] * 1.0 / len(labels)))
     axes_cor.set_xticklabels(labels, rotation=90)
     axes_cor.set_yticklabels(labels)
 
-    matrix_image.figure.savefig(imgdata, bbox_inches='tight')
-    imgdata.seek(0)
-    result_string = 'data:image/png;base64,' + quote(base64.b64encode(imgdata.getvalue()))
-    plt.close(matrix_image.figure)
-    return result_string
+    return _to_string(fig_cor, bbox_inches='tight')
+
+def _render(key, func, args):
+    return key, func(*args)
+
+def render(plots, pool_size=1):
+    """Render plots, in a pool of processes if there are many of them.
+
+    The plots are drawn with the object oriented API of matplotlib and the Agg backend,
+    so the processes have no shared state, and they are collected as they finish.
+    The workers use the style of the report (see `use_style`).
+
+    Parameters
+    ----------
+    plots : dict
+        The plots to render, as a `(function, args)` tuple by key, for example
+        `(histogram, (hist,))`. The functions and arguments must be picklable.
+    pool_size : int
+        Number of processes. The plots are rendered in the current process if it is
+        1 or if there are less than `POOL_MIN_PLOTS` plots.
+
+    Returns
+    -------
+    dict
+        The rendered plot of each key.
+    """
+    if pool_size <= 1 or len(plots) < POOL_MIN_PLOTS:
+        return dict(_render(key, func, args) for key, (func, args) in plots.items())
+    with ProcessPoolExecutor(max_workers=pool_size, initializer=use_style) as pool:
+        futures = [pool.submit(_render, key, func, args) for key, (func, args) in plots.items()]
+        return dict(future.result() for future in as_completed(futures))
@@ -1,14 +1,78 @@
 # -*- coding: utf-8 -*-
 """Generate reports"""
+import base64
+import hashlib
+import os
 import sys
 import six
 import pandas as pd
 import dask_profiling.formatters as formatters
 import dask_profiling.templates as templates
-import dask_profiling.plot as plot
+import dask_profiling.svg as svg
+try:
+    from urllib import unquote
+except ImportError:
+    from urllib.parse import unquote
 
+CORRELATION_TITLES = {'pearson': 'Pearson', 'spearman': 'Spearman', 'kendall': 'Kendall', 'cramers': u"Cramér's V"}
+"""Dict: The title of the matrix of each correlation method"""
 
-def to_html(sample, stats_object):
+IMAGES = ('mini_histogram', 'histogram')
+"""Tuple: The statistics of a variable which are images"""
+
+
+class AssetDirectory(object):
+    """Directory where the images of a report are written, once per content.
+
+    The images are named after the hash of their content, so the identical plots
+    (of constant-like variables for example) are stored once, also across the
+    reports sharing the directory. The report refers to them by a relative URL.
+
+    Parameters
+    ----------
+    directory : str
+        Where the images are written, created if it doesn't exist.
+    url : str
+        The URL of the directory in the report, typically relative to the report file.
+        The default is `directory`.
+    """
+
+    def __init__(self, directory, url=None):
+        self.directory = directory
+        self.url = (directory if url is None else url).replace(os.sep, '/')
+        self.written = set()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def add(self, image):
+        """Write an image if it is not already in the directory, return its URL.
+
+        Parameters
+        ----------
+        image : str
+            A PNG image encoded as a data URI or SVG markup, see `plot` and `svg`.
+
+        Returns
+        -------
+        str
+            The URL of the image file.
+        """
+        if image.startswith('<svg'):
+            content, extension = image.encode('utf8'), '.svg'
+        else:
+            content, extension = base64.b64decode(unquote(image.split(',', 1)[1])), '.png'
+        name = hashlib.sha1(content).hexdigest()[:20] + extension
+        if name not in self.written:
+            path = os.path.join(self.directory, name)
+            if not os.path.exists(path):
+                with open(path, 'wb') as f:
+                    f.write(content)
+            self.written.add(name)
+        return self.url.rstrip('/') + '/' + name
+
+
+
+def to_html(sample, stats_object, assets=None):
     """Generate a HTML report from summary statistics and a given sample.
 
     Parameters
@@ -17,11 +81,37 @@ def to_html(sample, stats_object):
         the sample you want to print
     stats_object : dict
         Summary statistics. Should be generated with an appropriate describe() function
+    assets : AssetDirectory
+        Where the images are written, they are embedded in the report (`None`) by default.
 
     Returns
     -------
     str
         containing profile report in HTML format
+    """
+    return u''.join(generate_html(sample, stats_object, assets))
+
+
+def generate_html(sample, stats_object, assets=None):
+    """Generate a HTML report from summary statistics and a given sample, by chunks.
+
+    The messages of the overview are collected beforehand, then each variable is
+    rendered when its chunk is reached, so the report can be written as it is
+    generated without holding it in memory (see `ProfileReport.to_file`).
+
+    Parameters
+    ----------
+    sample : DataFrame
+        the sample you want to print
+    stats_object : dict
+        Summary statistics. Should be generated with an appropriate describe() function
+    assets : AssetDirectory
+        Where the images are written, they are embedded in the report (`None`) by default.
+
+    Returns
+    -------
+    generator
+        The chunks of the report in HTML format.
 
     Notes
     -----
@@ -78,37 +168,41 @@ def to_html(sample, stats_object):
                                        label_in_bar=label_in_bar,
                                        label_after_bar=label_after_bar)
 
-    def freq_table(freqtable, n, table_template, row_template, max_number_to_print, nb_col=6):
+    def freq_table(freqtable, n, count, distinct_count, table_template, row_template, max_number_to_print, varid,
+                   nb_col=6):
 
-        freq_rows_html = u''
+        freq_rows_html = []
 
         if max_number_to_print > n:
                 max_number_to_print=n
 
         if max_number_to_print < len(freqtable):
-            freq_other = sum(freqtable.iloc[max_number_to_print:])
             min_freq = freqtable.values[max_number_to_print]
         else:
-            freq_other = 0
             min_freq = 0
 
-        freq_missing = n - sum(freqtable)
+        # The table may only hold the most frequent values (see top_k), count the others from the totals
+        freq_other = max(count - sum(freqtable.iloc[0:max_number_to_print]), 0)
+        freq_missing = n - count
+        # The distinct count includes the missing values
+        distinct_other = distinct_count - (freq_missing > 0) - min(max_number_to_print, len(freqtable))
         max_freq = max(freqtable.values[0], freq_other, freq_missing)
 
         # TODO: Correctly sort missing and other
 
         for label, freq in six.iteritems(freqtable.iloc[0:max_number_to_print]):
-            freq_rows_html += _format_row(freq, label, max_freq, row_template, n)
+            freq_rows_html.append(_format_row(freq, label, max_freq, row_template, n))
 
         if freq_other > min_freq:
-            freq_rows_html += _format_row(freq_other,
-                                         "Other values (%s)" % (freqtable.count() - max_number_to_print), max_freq, row_template, n,
-                                         extra_class='other')
+            freq_rows_html.append(_format_row(freq_other,
+                                              "Other values (%s)" % distinct_other, max_freq, row_template, n,
+                                              extra_class='other'))
 
         if freq_missing > min_freq:
-            freq_rows_html += _format_row(freq_missing, "(Missing)", max_freq, row_template, n, extra_class='missing')
+            freq_rows_html.append(_format_row(freq_missing, "(Missing)", max_freq, row_template, n,
+                                              extra_class='missing'))
 
-        return table_template.render(rows=freq_rows_html, varid=hash(idx), nb_col=nb_col)
+        return table_template.render(rows=u''.join(freq_rows_html), varid=varid, nb_col=nb_col)
 
     def extreme_obs_table(freqtable, table_template, row_template, number_to_print, n, ascending = True):
 
@@ -126,26 +220,23 @@ def to_html(sample, stats_object):
         else:
             obs_to_print = sorted_freqTable.iloc[-number_to_print:]
 
-        freq_rows_html = ''
         max_freq = max(obs_to_print.values)
+        freq_rows_html = [_format_row(freq, label, max_freq, row_template, n)
+                          for label, freq in six.iteritems(obs_to_print)]
 
-        for label, freq in six.iteritems(obs_to_print):
-            freq_rows_html += _format_row(freq, label, max_freq, row_template, n)
-
-        return table_template.render(rows=freq_rows_html)
-
-    # Variables
-    rows_html = u""
-    messages = []
-    render_htmls = {}
-
-    for idx, row in stats_object['variables'].iterrows():
+        return table_template.render(rows=u''.join(freq_rows_html))
 
+    def format_values(idx, row):
+        """Format the statistics of a variable."""
         formatted_values = {'varname': idx, 'varid': hash(idx)}
-        row_classes = {}
-
         for col, value in six.iteritems(row):
             formatted_values[col] = fmt(value, col)
+        return formatted_values
+
+    def classify_variable(idx, row, formatted_values):
+        """Return the classes of the statistics of a variable and the messages about it."""
+        row_classes = {}
+        messages = []
 
         for col in set(row.index) & six.viewkeys(row_formatters):
             row_classes[col] = row_formatters[col](row[col])
@@ -153,37 +244,61 @@ def to_html(sample, stats_object):
                 messages.append(templates.messages[col].format(formatted_values, varname = idx))
 
         if row['type'] in {'CAT', 'BOOL'}:
-            formatted_values['minifreqtable'] = freq_table(stats_object['freq'][idx], n_obs,
-                                                           templates.template('mini_freq_table'), 
-                                                           templates.template('mini_freq_table_row'), 
-                                                           3, 
-                                                           templates.mini_freq_table_nb_col[row['type']])
-
             if row['distinct_count'] > 50:
                 messages.append(templates.messages['HIGH_CARDINALITY'].format(formatted_values, varname = idx))
                 row_classes['distinct_count'] = "alert"
             else:
                 row_classes['distinct_count'] = ""
 
+        if row['type'] in {'UNSUPPORTED', 'CORR', 'CONST', 'RECODED'}:
+            messages.append(templates.messages[row['type']].format(formatted_values))
+
+        return row_classes, messages
+
+    def render_variable(idx, row, formatted_values, row_classes):
+        varid = formatted_values['varid']
+        if assets is not None:
+            for key in IMAGES:
+                if formatted_values.get(key):
+                    formatted_values[key] = assets.add(formatted_values[key])
+
+        if row['type'] in {'CAT', 'BOOL'}:
+            formatted_values['minifreqtable'] = freq_table(stats_object['freq'][idx], n_obs, row['count'], row['distinct_count'],
+                                                           templates.template('mini_freq_table'), 
+                                                           templates.template('mini_freq_table_row'), 
+                                                           3, varid,
+                                                           templates.mini_freq_table_nb_col[row['type']])
+
         if row['type'] == 'UNIQUE':
             obs = stats_object['freq'][idx].index
+            try:
+                obs = obs.sort_values()
+            except TypeError:
+                pass
 
             formatted_values['firstn'] = pd.DataFrame(obs[0:3], columns=["First 3 values"]).to_html(classes="example_values", index=False)
             formatted_values['lastn'] = pd.DataFrame(obs[-3:], columns=["Last 3 values"]).to_html(classes="example_values", index=False)
-        if row['type'] == 'UNSUPPORTED':
-            formatted_values['varname'] = idx
-            messages.append(templates.messages[row['type']].format(formatted_values))
-        elif row['type'] in {'CORR', 'CONST', 'RECODED'}:
-            formatted_values['varname'] = idx
-            messages.append(templates.messages[row['type']].format(formatted_values))
-        else:
-            formatted_values['freqtable'] = freq_table(stats_object['freq'][idx], n_obs,
-                                                       templates.template('freq_table'), templates.template('freq_table_row'), 10)
+        if row['type'] not in {'UNSUPPORTED', 'CORR', 'CONST', 'RECODED'}:
+            formatted_values['freqtable'] = freq_table(stats_object['freq'][idx], n_obs, row['count'], row['distinct_count'],
+                                                       templates.template('freq_table'), templates.template('freq_table_row'), 10, varid)
             formatted_values['firstn_expanded'] = extreme_obs_table(stats_object['freq'][idx], templates.template('freq_table'), templates.template('freq_table_row'), 5, n_obs, ascending = True)
             formatted_values['lastn_expanded'] = extreme_obs_table(stats_object['freq'][idx], templates.template('freq_table'), templates.template('freq_table_row'), 5, n_obs, ascending = False)
 
-        rows_html += templates.row_templates_dict[row['type']].render(values=formatted_values, row_classes=row_classes)
-    render_htmls['rows_html'] = rows_html
+        return templates.row_templates_dict[row['type']].render(values=formatted_values, row_classes=row_classes)
+
+    # Variables
+    # The messages are shown in the overview, before the variables: they are collected first, with the
+    # classes of the statistics, then the variables are formatted and rendered one at a time as the report
+    # is generated, so only the classes are held for all of them
+    messages = []
+    variable_classes = []
+    for idx, row in stats_object['variables'].iterrows():
+        row_classes, variable_messages = classify_variable(idx, row, format_values(idx, row))
+        messages.extend(variable_messages)
+        variable_classes.append(row_classes)
+    render_htmls = {'rows_html': (render_variable(idx, row, format_values(idx, row), row_classes)
+                                  for (idx, row), row_classes in zip(stats_object['variables'].iterrows(),
+                                                                     variable_classes))}
 
     # Overview
     formatted_values = {k: fmt(v, k) for k, v in six.iteritems(stats_object['table'])}
@@ -194,25 +309,31 @@ def to_html(sample, stats_object):
         if row_classes[col] == "alert" and col in templates.messages:
             messages.append(templates.messages[col].format(formatted_values, varname = idx))
 
-    messages_html = u''
-    for msg in messages:
-        messages_html += templates.message_row.format(message=msg)
+    messages_html = u''.join(templates.message_row.format(message=msg) for msg in messages)
 
     overview_html = templates.template('overview').render(values=formatted_values, row_classes = row_classes, messages=messages_html)
     render_htmls['overview_html'] = overview_html
 
     # Add plot of matrix correlation if the dataframe is not empty
-    if len(stats_object['correlations']['pearson']) > 0:
-        pearson_matrix = plot.correlation_matrix(stats_object['correlations']['pearson'], 'Pearson')
-        # spearman_matrix = plot.correlation_matrix(stats_object['correlations']['spearman'], 'Spearman')
-        correlations_html = templates.template('correlations').render(
-            # values={'pearson_matrix': pearson_matrix, 'spearman_matrix': spearman_matrix})
-            values={'pearson_matrix': pearson_matrix})
+    # The matrices other than Pearson's are only there if they were asked for
+    # They are rendered with the histograms by describe(), only older descriptions lack them
+    matrices = stats_object.get('correlation_plots')
+    if matrices is None:
+        if stats_object['table'].get('renderer') == 'svg':
+            plotter = svg
+        else:
+            # matplotlib is only imported to render images
+            import dask_profiling.plot as plotter
+        matrices = {'{}_matrix'.format(method): plotter.correlation_matrix(corr, CORRELATION_TITLES.get(method, method))
+                    for method, corr in six.iteritems(stats_object['correlations']) if len(corr) > 0}
+    if assets is not None:
+        matrices = {key: assets.add(image) for key, image in six.iteritems(matrices)}
+    if matrices:
+        correlations_html = templates.template('correlations').render(values=matrices)
         render_htmls['correlations_html'] = correlations_html
 
     # Add sample
     sample_html = templates.template('sample').render(sample_table_html=sample.to_html(classes="sample"))
     render_htmls['sample_html'] = sample_html
 
-    # TODO: should be done in the template
-    return templates.template('base').render(render_htmls)
+    return templates.template('base').generate(render_htmls)
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""Mergeable state of a profile, to keep the profile of a growing dataset up to date."""
+import pickle
+import time
+import numpy as np
+import pandas as pd
+import dask.dataframe as dd
+import dask_profiling.base as base
+import dask_profiling.accumulators as accumulators
+from dask_profiling.describe import plan_1d, derive_1d, describe_table, meta_vartypes, plan_correlations, \
+    pearson_correlations
+
+OPTIONS = ('bins', 'quantile_compression', 'approx_distinct', 'top_k', 'check_correlation', 'correlation_threshold',
+           'correlation_overrides', 'pool_size', 'renderer', 'partition_cache')
+"""Tuple: The parameters of `describe.describe` which a state supports, the others need a pass the state can't merge"""
+
+
+class ProfileState(object):
+    """Summaries of a dataset from which its profile is described, which can be merged with the ones of new data.
+
+    Every statistic comes from a mergeable accumulator (see `dask_profiling.accumulators`):
+    the percentiles, the mean absolute deviation and the histograms are estimated from a
+    t-digest, the duplicates from a HyperLogLog sketch of the rows and the correlations
+    from co-moments. So the profile of an append-only dataset is kept up to date with
+    `update` by only reading the new data. The state can be pickled, see `save` and `load`.
+
+    The memory of the state is bounded, except for the exact frequency tables and distinct
+    counts (`top_k=None` or `approx_distinct=False`) which grow with the number of distinct values.
+
+    Parameters
+    ----------
+    summaries : dict
+        The computed summaries of each variable, see `describe.plan_1d`.
+    table : TableCounts
+        The number of rows and memory usage.
+    distinct_rows : HyperLogLog
+        The sketch of the distinct rows.
+    comoments : list
+        The co-moments of the pairs of blocks of numerical variables, see `describe.plan_correlations`.
+    options : dict
+        The parameters of `describe`, they must be the same for the merged states.
+    """
+
+    def __init__(self, summaries, table, distinct_rows, comoments, options):
+        self.summaries = summaries
+        self.table = table
+        self.distinct_rows = distinct_rows
+        self.comoments = comoments
+        self.options = options
+
+    @classmethod
+    @base.planning
+    def from_dataframe(cls, df, bins=10, quantile_compression=100, approx_distinct=True, top_k=None, vartypes=None,
+                       **kwargs):
+        """Summarize a dataset, see `describe.describe` for the parameters.
+
+        The data is read once, all the summaries are computed in a single graph.
+
+        Parameters
+        ----------
+        df : DataFrame
+            Data to be analyzed.
+        vartypes : dict
+            The types of the variables known before scanning them, see `describe.meta_vartypes`.
+            They are inferred from `df` (`None`) by default, which reads a part of its first partition.
+
+        Returns
+        -------
+        ProfileState
+            The state of the profile of `df`.
+
+        Raises
+        ------
+        ValueError
+            If an option is not supported by a state, see `OPTIONS`.
+        """
+        if not isinstance(df, dd.DataFrame):
+            raise TypeError("df must be of type dask.dataframe.DataFrame")
+        unsupported = sorted(set(kwargs) - set(OPTIONS))
+        if unsupported:
+            raise ValueError("The options {} are not supported by a profile state".format(', '.join(unsupported)))
+        if not isinstance(df._meta.index, pd.RangeIndex):
+            df = df.reset_index()
+
+        options = dict(kwargs)
+        options.update({'bins': bins, 'quantile_compression': quantile_compression,
+                        'approx_distinct': approx_distinct, 'top_k': top_k})
+        partition_cache = options.pop('partition_cache', None)
+
+        if vartypes is None:
+            vartypes = meta_vartypes(df)
+        plans = {col: plan_1d(df[col], vartypes[col], mergeable=True, partition_cache=partition_cache, **options)
+                 for col in df.columns}
+        table = base.STATS_CACHE.reduce(df, accumulators.TableCounts, partition_cache)
+        hashed_columns = [col for col in df.columns if vartypes[col] != base.S_TYPE_UNSUPPORTED]
+        distinct_rows = base.STATS_CACHE.reduce(df[hashed_columns], accumulators.ApproxDistinctRows, partition_cache)
+        comoments = plan_correlations(df, partition_cache)
+
+        plans, table, distinct_rows, comoments = base.STATS_CACHE.compute(plans, table, distinct_rows, comoments,
+                                                                          optimize_graph=False)
+        return cls(plans, table, distinct_rows, comoments, options)
+
+    def merge(self, other):
+        """Merge with the state of other data having the same variables.
+
+        Parameters
+        ----------
+        other : ProfileState
+            The state of the other data.
+
+        Returns
+        -------
+        ProfileState
+            The state of the union of the data.
+
+        Raises
+        ------
+        ValueError
+            If the variables, their dtypes or the options are different.
+        """
+        if list(self.summaries) != list(other.summaries):
+            raise ValueError("The states must have the same variables")
+        if self.options != other.options:
+            raise ValueError("The states must have the same options")
+        summaries = dict()
+        for col, summary in self.summaries.items():
+            other_summary = other.summaries[col]
+            if summary['dtype'] != other_summary['dtype']:
+                raise ValueError("The dtypes of the variable {} are different".format(col))
+            summaries[col] = {'dtype': summary['dtype']}
+            for key in summary.keys() | other_summary.keys():
+                if key == 'dtype':
+                    continue
+                # An unsupported variable may not have all the summaries
+                parts = [s.get(key, accumulators.Unsupported()) for s in (summary, other_summary)]
+                summaries[col][key] = accumulators.merge_all(parts)
+        comoments = [block.merge(other_block) for block, other_block in zip(self.comoments, other.comoments)]
+        return ProfileState(summaries, self.table.merge(other.table), self.distinct_rows.merge(other.distinct_rows),
+                            comoments, self.options)
+
+    def update(self, df):
+        """Add new data to the state, only the new data is read.
+
+        Parameters
+        ----------
+        df : DataFrame
+            The new data, with the same variables.
+
+        Returns
+        -------
+        ProfileState
+            The updated state (itself).
+        """
+        merged = self.merge(ProfileState.from_dataframe(df, **self.options))
+        self.__dict__.update(merged.__dict__)
+        return self
+
+    def describe(self, confidence=None):
+        """Describe the dataset, the result is the same as `describe.describe`.
+
+        Parameters
+        ----------
+        confidence : float
+            Confidence level of the intervals of the statistics if the state only covers
+            a sample of the dataset, see `describe.confidence_intervals`.
+            There are no intervals (`None`) by default.
+
+        Returns
+        -------
+        dict
+            Containing the table, variables, freq and correlations keys, see `describe.describe`.
+        """
+        summaries = {col: derive_1d(summary, **self.options) for col, summary in self.summaries.items()}
+        return describe_table(summaries, self.table.size, self.table.memory, pearson_correlations(self.comoments),
+                              self.distinct_rows.count(), confidence=confidence, **self.options)
+
+    def save(self, path):
+        """Write the state to a file (pickle)."""
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        """Read a state written with `save`."""
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+
+def profile_within(df, time_budget, batch_size=1, random_state=None, **kwargs):
+    """Summarize the partitions of a dataset in random order until a time budget runs out.
+
+    The partitions are summarized by batches, each batch is merged into the state. A batch
+    is not started if it is expected to end after the budget, from the time taken by the
+    previous one, but the first batch is always summarized. So the budget may be exceeded
+    by a slower batch than expected, or by a first batch longer than the budget.
+
+    Parameters
+    ----------
+    df : DataFrame
+        Data to be analyzed.
+    time_budget : float
+        The time budget, in seconds.
+    batch_size : int
+        The number of partitions summarized together, typically the number of workers.
+        The default is 1.
+    random_state : int
+        Seed of the order of the partitions, drawn at random (`None`) by default.
+
+    Returns
+    -------
+    ProfileState
+        The state of the partitions summarized within the budget.
+    float
+        The fraction of the partitions summarized.
+    """
+    start = time.time()
+    if not isinstance(df._meta.index, pd.RangeIndex):
+        df = df.reset_index()
+    order = np.random.RandomState(random_state).permutation(df.npartitions)
+    # The types are sniffed once, not from each batch
+    vartypes = meta_vartypes(df)
+
+    state, done, batch_time = None, 0, 0.0
+    while done < len(order):
+        if state is not None and time.time() - start + batch_time > time_budget:
+            break
+        batch_start = time.time()
+        batch = sorted(order[done:done + batch_size].tolist())
+        batch_state = ProfileState.from_dataframe(df.partitions[batch], vartypes=vartypes, **kwargs)
+        state = batch_state if state is None else state.merge(batch_state)
+        done += len(batch)
+        batch_time = time.time() - batch_start
+
+    return state, done * 1.0 / len(order)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""Plot distribution of datasets as inline SVG, without matplotlib.
+
+The plots are drawn from the bin counts (or the correlations) by the templates,
+the markup is embedded as is in the report, it weighs a few kilobytes per plot.
+The sizes and colors are the ones of `dask_profiling.plot` at 100 dpi.
+"""
+import numpy as np
+import pandas as pd
+import dask_profiling.templates as templates
+
+FACECOLOR = '#337ab7'
+"""Str: The color of the bars"""
+
+BACKGROUND = '#EAEAF2'
+"""Str: The color of the axes of the histograms, behind the white grid"""
+
+
+def _round(value):
+    """Format a coordinate with one decimal, to keep the markup short."""
+    return ('%.1f' % value).rstrip('0').rstrip('.')
+
+
+def _labels(values, is_date):
+    """Format the values of the ticks, dates on their int64 representation."""
+    if not is_date:
+        return ['{:.4g}'.format(value) for value in values]
+    dates = pd.to_datetime(np.asarray(values).astype(np.int64))
+    date_format = '%Y-%m-%d' if len(dates) < 2 or dates[-1] - dates[0] > pd.Timedelta(days=2) else '%Y-%m-%d %H:%M'
+    return [date.strftime(date_format) for date in dates]
+
+
+def _render_histogram(hist, width, height, area, ticks, grid=False, titles=False, font_size=10):
+    """Render the bars of a histogram and its ticks.
+
+    Parameters
+    ----------
+    hist : Histogram
+        The bin counts and edges of the data to plot.
+    width, height : int
+        The size of the image in pixels.
+    area : tuple
+        The left, right, top and bottom of the axes, as fractions of the image like `subplots_adjust`.
+    ticks : int
+        The number of ticks of the x axis, the y axis has ticks if there is a grid.
+    grid : boolean
+        Whether or not to draw the axes background with a grid.
+    titles : boolean
+        Whether or not the bars have a title (shown on hover) with their edges and count.
+    font_size : int
+        The size of the labels in pixels.
+
+    Returns
+    -------
+    str
+        The SVG markup.
+    """
+    left, right, top, bottom = area[0] * width, area[1] * width, (1 - area[2]) * height, (1 - area[3]) * height
+    counts = np.asarray(hist.counts, dtype=float)
+    edges = np.asarray(hist.edges, dtype=float)
+    span = edges[-1] - edges[0]
+    scale_x = (right - left) / span if span > 0 else 0.0
+    max_count = counts.max() if len(counts) > 0 and counts.max() > 0 else 1.0
+    scale_y = (bottom - top) / max_count
+
+    labels = _labels(edges, hist.is_date) if titles else None
+    bars = []
+    for i, count in enumerate(counts):
+        if count <= 0:
+            continue
+        x = left + (edges[i] - edges[0]) * scale_x
+        bar_width = (edges[i + 1] - edges[i]) * scale_x if span > 0 else right - left
+        bars.append({'x': _round(x), 'y': _round(bottom - count * scale_y), 'width': _round(bar_width),
+                     'height': _round(count * scale_y),
+                     'title': '[{}, {}): {:d}'.format(labels[i], labels[i + 1], int(count)) if titles else None})
+
+    tick_values = np.linspace(edges[0], edges[-1], ticks)
+    xticks = [{'position': _round(left + (value - edges[0]) * scale_x if span > 0 else (left + right) / 2),
+               'label': label} for value, label in zip(tick_values, _labels(tick_values, hist.is_date))]
+    yticks = []
+    if grid:
+        tick_values = np.linspace(0, max_count, 5)
+        yticks = [{'position': _round(bottom - value * scale_y), 'label': label}
+                  for value, label in zip(tick_values, _labels(tick_values, False))]
+
+    return templates.template('histogram_svg').render(
+        width=width, height=height, left=_round(left), top=_round(top), area_width=_round(right - left),
+        area_height=_round(bottom - top), bottom=_round(bottom), right=_round(right),
+        label_y=_round(bottom + font_size + 4), font_size=font_size, background=BACKGROUND if grid else None,
+        facecolor=FACECOLOR, bars=bars, xticks=xticks, yticks=yticks)
+
+
+def histogram(hist, width=600, height=400):
+    """Plot an histogram of the data.
+
+    Parameters
+    ----------
+    hist: Histogram
+        The bin counts of the data to plot.
+    width, height : int
+        The size of the image in pixels, the default is (600, 400).
+
+    Returns
+    -------
+    str
+        The SVG markup of the image.
+    """
+    return _render_histogram(hist, width, height, (0.15, 0.95, 0.9, 0.1), ticks=5, grid=True, titles=True)
+
+
+def mini_histogram(hist, width=200, height=75):
+    """Plot a small (mini) histogram of the data, with the extrema as labels.
+
+    Parameters
+    ----------
+    hist: Histogram
+        The bin counts of the data to plot.
+    width, height : int
+        The size of the image in pixels, the default is (200, 75).
+
+    Returns
+    -------
+    str
+        The SVG markup of the image.
+    """
+    return _render_histogram(hist, width, height, (0.15, 0.85, 1, 0.35), ticks=2, font_size=8)
+
+
+def _color(value):
+    """The color of a correlation, blue (-1) to white (0) to red (1) like the 'bwr' colormap."""
+    value = min(max(value, -1.0), 1.0)
+    fade = int(round(255 * (1 - abs(value))))
+    return '#{:02x}{:02x}ff'.format(fade, fade) if value < 0 else '#ff{:02x}{:02x}'.format(fade, fade)
+
+
+def correlation_matrix(corrdf, title, cell_size=20):
+    """Plot image of a matrix correlation, the value of a cell is shown on hover.
+
+    Parameters
+    ----------
+    corrdf: DataFrame
+        The matrix correlation to plot.
+    title: str
+        The matrix title
+    cell_size : int
+        The size of the cells in pixels, the default is 20.
+
+    Returns
+    -------
+    str
+        The SVG markup of the image.
+    """
+    labels = [str(label) for label in corrdf.columns]
+    # The labels are about 7 pixels per character
+    margin = min(max(len(label) for label in labels) * 7, 150) + 10
+    top = margin + 30
+    cells = []
+    for i, row in enumerate(corrdf.values):
+        for j, value in enumerate(row):
+            if np.isnan(value):
+                continue
+            cells.append({'x': margin + j * cell_size, 'y': top + i * cell_size, 'color': _color(value),
+                          'title': u'{} / {}: {:.3f}'.format(labels[i], labels[j], value)})
+    positions = [_round((i + 0.5) * cell_size) for i in range(len(labels))]
+    return templates.template('correlation_matrix_svg').render(
+        width=margin + len(labels) * cell_size + 10, height=top + len(labels) * cell_size + 10, margin=margin,
+        top=top, cell_size=cell_size, title=title, cells=cells, labels=list(zip(labels, positions)))
@@ -1,12 +1,36 @@
 # coding=UTF-8
 """Contains all templates used for generating the HTML profile report"""
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
 
-from jinja2 import Environment, PackageLoader
+_jinja2_env = None
 
-# Initializing Jinja
-pl = PackageLoader('dask_profiling', 'templates')
-jinja2_env = Environment(lstrip_blocks=True, trim_blocks=True, loader=pl)
 
+def environment():
+    """Return the Jinja environment, initialized on first use since importing Jinja takes a while."""
+    global _jinja2_env
+    if _jinja2_env is None:
+        from jinja2 import Environment, PackageLoader
+        _jinja2_env = Environment(lstrip_blocks=True, trim_blocks=True,
+                                  loader=PackageLoader('dask_profiling', 'templates'))
+    return _jinja2_env
+
+
+class _Lazy(object):
+    """Stand-in for an object created on first use, its attributes are the ones of the object."""
+
+    def __init__(self, factory):
+        self._factory = factory
+
+    def __getattr__(self, name):
+        return getattr(self._factory(), name)
+
+
+# The Jinja environment and its loader, kept for compatibility, see `environment`
+jinja2_env = _Lazy(environment)
+pl = _Lazy(lambda: environment().loader)
 # Mapping between template name and file
 templates = {'freq_table_row': 'freq_table_row.html',
              'mini_freq_table_row': 'mini_freq_table_row.html',
@@ -25,7 +49,9 @@ templates = {'freq_table_row': 'freq_table_row.html',
              'sample': 'sample.html',
              'base': 'base.html',
              'wrapper': 'wrapper.html',
-             'correlations' : 'correlations.html'
+             'correlations' : 'correlations.html',
+             'histogram_svg': 'histogram.svg',
+             'correlation_matrix_svg': 'correlation_matrix.svg'
              }
 
 # Mapping between row type and var type
@@ -50,28 +76,45 @@ def template(template_name):
 
     Returns
     -------
-    The Jinja template ready for rendering
+    The Jinja template ready for rendering, it is compiled on first use then cached by the environment
     """
     globals = None
     if template_name.startswith('row_'):
         # This is a row template setting global variable
         globals = dict()
         globals['vartype'] = var_type[template_name.split('_')[1].upper()]
-    return jinja2_env.get_template(templates[template_name], globals=globals)
-
-
-# mapping between row type and template name
-row_templates_dict = {'NUM': template('row_num'),
-                      'DATE': template('row_date'),
-                      'DISCRETE': template('row_num'),
-                      'CAT': template('row_cat'),
-                      'BOOL': template('row_bool'),
-                      'UNIQUE': template('row_unique'),
-                      'CONST': template('row_const'),
-                      'CORR': template('row_corr'),
-                      'RECODED': template('row_recoded'),
-                      'UNSUPPORTED': template('row_unsupported')
-                      }
+    return environment().get_template(templates[template_name], globals=globals)
+
+
+# mapping between row type and template name, the templates are compiled when a report is rendered
+row_templates = {'NUM': 'row_num',
+                 'DATE': 'row_date',
+                 'DISCRETE': 'row_num',
+                 'CAT': 'row_cat',
+                 'BOOL': 'row_bool',
+                 'UNIQUE': 'row_unique',
+                 'CONST': 'row_const',
+                 'CORR': 'row_corr',
+                 'RECODED': 'row_recoded',
+                 'UNSUPPORTED': 'row_unsupported'
+                 }
+
+
+class _RowTemplates(Mapping):
+    """Mapping between row type and template, compiled on first access."""
+
+    def __getitem__(self, row_type):
+        return template(row_templates[row_type])
+
+    def __iter__(self):
+        return iter(row_templates)
+
+    def __len__(self):
+        return len(row_templates)
+
+
+# mapping between row type and template, kept for compatibility
+row_templates_dict = _RowTemplates()
 
 # The number of column to use in the display of the frequency table according to the category
 mini_freq_table_nb_col = {'CAT': 6, 'BOOL': 3}
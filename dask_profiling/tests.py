@@ -5,15 +5,30 @@ import unittest
 import datetime
 import numpy as np
 import pandas as pd
+import dask
+import dask.callbacks
 import dask.dataframe as dd
 from pandas import Series
 import six
 import dask_profiling
 from dask_profiling.describe import describe, describe_1d
 from dask_profiling.report import to_html
+from dask_profiling import accumulators
+from dask_profiling.state import ProfileState
+from dask_profiling import parquet
 import tempfile
 import shutil
 import os
+import pickle
+import gzip
+import subprocess
+import threading
+import sys
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
 check_is_NaN = "dask_profiling.check_is_NaN"
 
 
@@ -265,6 +280,36 @@ class DataFrameTest(unittest.TestCase):
 
         self.assertLess(200, os.path.getsize(filename))
 
+    def test_streamed_report(self):
+        """The report written as it is rendered is the same as the one rendered at once"""
+        p = dask_profiling.ProfileReport(self.df, renderer='svg')
+        filename = os.path.join(self.test_dir, "streamed.html")
+        p.to_file(outputfile=filename)
+        with open(filename, encoding='utf8') as f:
+            streamed = f.read()
+        self.assertEqual(streamed, p.to_html())
+        self.assertIn(p.html, streamed)
+        self.assertLess(len(self.results['variables']),
+                        len(list(dask_profiling.generate_html(self.df.head(), self.results))))
+
+    def test_assets_dir(self):
+        """The images are written once per content next to the compressed report"""
+        data = pd.DataFrame({'x': [1.5, 2, 2, 3, None], 'y': [1.5, 2, 2, 3, None], 'c': ['a', 'b', 'b', 'c', 'd']})
+        p = dask_profiling.ProfileReport(dd.from_pandas(data, npartitions=2), check_correlation=False,
+                                         renderer='svg')
+        filename = os.path.join(self.test_dir, "report.html.gz")
+        assets_dir = os.path.join(self.test_dir, "assets")
+        p.to_file(outputfile=filename, assets_dir=assets_dir, compress=True)
+        with gzip.open(filename, 'rt', encoding='utf8') as f:
+            html = f.read()
+        self.assertNotIn('<svg', html)
+        # The histograms of x and y are the same
+        self.assertEqual(len(os.listdir(assets_dir)), 3)
+        # The two histograms of each variable and the correlation matrix
+        self.assertEqual(html.count('<img src="assets/'), 5)
+        for name in os.listdir(assets_dir):
+            self.assertIn('src="assets/{}"'.format(name), html)
+
 
 class CategoricalDataTest(unittest.TestCase):
 
@@ -311,9 +356,519 @@ class Describe1dTest(unittest.TestCase):
         self._assert_unique(dd.from_pandas(pd.Series([1, 2, 2, np.nan, np.nan]), npartitions=2), False, 3/5)
 
     def _assert_unique(self, data, is_unique, p_unique):
-        desc_1d = describe_1d(data)
-        self.assertEqual(desc_1d['is_unique'], is_unique)
-        self.assertEqual(desc_1d['p_unique'], p_unique)
+        for approx_distinct in [True, False]:
+            dask_profiling.base.clear_cache()
+            desc_1d = describe_1d(data, approx_distinct=approx_distinct)
+            self.assertEqual(desc_1d['is_unique'], is_unique)
+            self.assertEqual(desc_1d['p_unique'], p_unique)
+
+class PlannerTest(unittest.TestCase):
+
+    def test_single_compute(self):
+        """The whole profile is computed with a single graph"""
+        dask_profiling.base.clear_cache()
+        data = pd.DataFrame({'x': [1, 2, 2, 3, None], 'c': ['a', 'b', 'b', 'c', 'd'],
+                             'd': pd.to_datetime(['2011-07-04', '1990-12-09', '1990-12-09', None, '1950-12-09'])})
+        starts = []
+        with dask.callbacks.Callback(start=starts.append):
+            results = describe(dd.from_pandas(data, npartitions=2))
+        # The sniff of the first partition, then the profile
+        self.assertEqual(len(starts), 2)
+        self.assertEqual(results['variables'].loc['x']['type'], 'NUM')
+        self.assertEqual(results['variables'].loc['c']['top'], 'b')
+        self.assertEqual(results['table']['n'], 5)
+
+    def test_meta_vartype(self):
+        """The types given by the dtypes are known before any scan"""
+        get_meta_vartype = dask_profiling.base.get_meta_vartype
+        self.assertEqual(get_meta_vartype(np.dtype(np.float64)), 'NUM')
+        self.assertEqual(get_meta_vartype(np.dtype(bool)), 'BOOL')
+        self.assertEqual(get_meta_vartype(np.dtype('datetime64[ns]')), 'DATE')
+        self.assertIsNone(get_meta_vartype(np.dtype(object), pd.Series(['a', None])))
+        self.assertEqual(get_meta_vartype(np.dtype(object), pd.Series([[1, 2], {'a': 1}])), 'UNSUPPORTED')
+
+    def test_exact_distinct(self):
+        """The distinct count comes from the value counts when all the values are counted"""
+        random = np.random.RandomState(0)
+        data = pd.Series(['v{}'.format(i) for i in random.randint(0, 10 ** 6, 10000)])
+        df = dd.from_pandas(data, npartitions=4)
+        plan = dask_profiling.describe.plan_1d(df)
+        self.assertIs(plan['distinct'], plan['frequencies'])
+        self.assertEqual(describe_1d(df)['distinct_count'], data.nunique())
+        plan = dask_profiling.describe.plan_1d(df, top_k=10)
+        self.assertIsNot(plan['distinct'], plan['frequencies'])
+
+    def test_duplicates(self):
+        data = pd.DataFrame({'x': [1, 2, 2, 1, 2], 'c': ['a', 'b', 'b', 'c', 'b'], 'l': [[1]] * 5})
+        results = describe(dd.from_pandas(data, npartitions=3))
+        self.assertEqual(results['variables'].loc['l']['type'], 'UNSUPPORTED')
+        self.assertEqual(results['table']['n_duplicates'], 2)
+        results = describe(dd.from_pandas(data, npartitions=3), approx_duplicates=True)
+        self.assertEqual(results['table']['n_duplicates'], 2)
+
+    def test_distinct_rows_buckets(self):
+        """The distinct hashes counted by bucket add up to the distinct rows"""
+        random = np.random.RandomState(0)
+        data = pd.DataFrame({'x': random.randint(0, 30, 1000), 'y': random.choice(list('abc'), 1000)})
+        plan = dask_profiling.describe.plan_distinct_rows(dd.from_pandas(data, npartitions=8), n_buckets=5)
+        buckets = dask.compute(plan)[0]
+        self.assertEqual(len(buckets), 5)
+        self.assertEqual(sum(bucket.count() for bucket in buckets), len(data.drop_duplicates()))
+        self.assertLess(max(bucket.count() for bucket in buckets), len(data.drop_duplicates()))
+
+    def test_blockwise_correlations(self):
+        """The tiled co-moments give the pairwise complete correlations of pandas"""
+        random = np.random.RandomState(0)
+        data = pd.DataFrame(random.randn(200, 7), columns=list('abcdefg'))
+        data['b'] += data['a']
+        data = data.mask(random.rand(200, 7) < 0.1)
+        data['s'] = 'text'
+        plan = dask_profiling.describe.plan_correlations(dd.from_pandas(data, npartitions=5), block_size=3)
+        self.assertEqual(len(plan), 6)
+        corr = dask_profiling.describe.pearson_correlations(dask.compute(plan)[0])
+        pd.testing.assert_frame_equal(corr, data.corr())
+
+    def test_rank_correlations(self):
+        """The ranks are exact when the sketches keep all the values, the sample is the whole data"""
+        random = np.random.RandomState(0)
+        data = pd.DataFrame({'a': random.randn(60), 'b': random.randint(0, 5, 60), 'c': random.choice(list('xy'), 60)})
+        data['d'] = np.exp(data['a']) + random.randn(60) * 0.1
+        results = describe(dd.from_pandas(data, npartitions=3), spearman=True, kendall_rows=100)
+        pd.testing.assert_frame_equal(results['correlations']['spearman'], data.corr(method='spearman'))
+        pd.testing.assert_frame_equal(results['correlations']['kendall'], data.corr(method='kendall'))
+        pearson_only = describe(dd.from_pandas(data, npartitions=3))
+        self.assertNotIn('spearman', pearson_only['correlations'])
+        # A matrix per method
+        self.assertEqual(to_html(data.head(), results).count('data:image/png'),
+                         to_html(data.head(), pearson_only).count('data:image/png') + 2)
+
+
+    def test_cramers_v(self):
+        """The associations of the categorical variables are computed from the most frequent values"""
+        random = np.random.RandomState(0)
+        data = pd.DataFrame({'x': random.choice(list('abcdef'), 300), 'z': random.choice(list('uv'), 300),
+                             'n': random.randn(300), 'id': ['id{}'.format(i) for i in range(300)]})
+        data['y'] = data['x'].str.upper()
+        results = describe(dd.from_pandas(data, npartitions=3), cramers_v=True, cramers_levels=4)
+        cramers = results['correlations']['cramers']
+        self.assertEqual(sorted(cramers.columns), ['x', 'y', 'z'])
+        self.assertAlmostEqual(cramers.loc['x', 'y'], 1.0)
+        self.assertLess(cramers.loc['x', 'z'], 0.2)
+        self.assertEqual(results['variables'].loc['x']['count'], 300)
+        self.assertEqual(to_html(data.head(), results).count('data:image/png'),
+                         to_html(data.head(), describe(dd.from_pandas(data, npartitions=3))).count('data:image/png') + 1)
+
+    def test_correlated_variables(self):
+        """Only the middle variable of a chain of correlations is rejected"""
+        corr = pd.DataFrame([[1, 0.95, 0.5, 0], [0.95, 1, 0.95, 0], [0.5, 0.95, 1, np.nan], [0, 0, np.nan, 1]],
+                            index=list('xyzw'), columns=list('xyzw'))
+        self.assertEqual(dask_profiling.describe.correlated_variables(corr), {'y': ('x', 0.95)})
+        self.assertEqual(dask_profiling.describe.correlated_variables(corr, overrides=['y']),
+                         {'z': ('y', 0.95), 'x': ('y', 0.95)})
+        self.assertEqual(dask_profiling.describe.correlated_variables(corr.iloc[:2, :2]), {'y': ('x', 0.95)})
+
+
+    def test_render_pool(self):
+        """The plots rendered by a pool of processes are the same"""
+        dask_profiling.plot.use_style()
+        hist = accumulators.Histogram(np.arange(10), np.linspace(0, 1, 11))
+        plots = {i: (dask_profiling.plot.mini_histogram if i % 2 else dask_profiling.plot.histogram, (hist,))
+                 for i in range(dask_profiling.plot.POOL_MIN_PLOTS)}
+        rendered = dask_profiling.plot.render(plots, pool_size=2)
+        self.assertEqual(rendered, dask_profiling.plot.render(plots))
+        self.assertNotEqual(rendered[0], rendered[1])
+
+    def test_svg_renderer(self):
+        """The SVG histograms have a bar per non-empty bin and are embedded in the report"""
+        hist = accumulators.Histogram(np.array([3, 0, 1]), np.array([0., 1., 2., 3.]))
+        image = dask_profiling.svg.histogram(hist)
+        self.assertTrue(image.startswith('<svg'))
+        self.assertEqual(image.count('<title>'), 2)
+        self.assertIn('<title>[0, 1): 3</title>', image)
+
+        data = pd.DataFrame({'x': [1.5, 2, 2, 3, None], 'y': [5, 1, 4, 2, 3], 'c': ['a', 'b', 'b', 'c', 'd'],
+                             'd': pd.date_range('2020-01-01', periods=5)})
+        results = describe(dd.from_pandas(data, npartitions=2), renderer='svg')
+        self.assertTrue(results['variables'].loc['d', 'mini_histogram'].startswith('<svg'))
+        # The correlation matrices are rendered with the histograms
+        self.assertEqual(list(results['correlation_plots']), ['pearson_matrix'])
+        self.assertTrue(results['correlation_plots']['pearson_matrix'].startswith('<svg'))
+        html = to_html(data.head(), results)
+        self.assertNotIn('data:image/png', html)
+        self.assertEqual(html.count('<svg'), 2 * 3 + 1)
+        self.assertRaises(ValueError, describe, dd.from_pandas(data, npartitions=2), renderer='jpg')
+
+
+class StatsCacheTest(unittest.TestCase):
+
+    def test_eviction(self):
+        """The least recently used statistics are evicted beyond the budget"""
+        cache = dask_profiling.base.StatsCache(max_bytes=3000)
+        for key in range(3):
+            cache.put(key, np.zeros(100))
+        cache.get(0)
+        cache.put(3, np.zeros(100))
+        self.assertEqual(sorted(cache._data), [0, 2, 3])
+        self.assertLessEqual(cache.nbytes, 3000)
+        cache.put(4, np.zeros(1000))
+        self.assertNotIn(4, cache)
+
+    def test_failed_profile(self):
+        """The summaries planned by a failed profile are not computed by the next one"""
+        cache = dask_profiling.base.STATS_CACHE
+        data = dd.from_pandas(pd.DataFrame({'x': [1.5, 2, 2, 3, None], 'y': [1, 2, 3, 4, 5]}), npartitions=2)
+        self.assertRaises(ValueError, describe, data, kendall_rows=-5)
+        self.assertEqual(cache._pending, [])
+
+        # Nor are the ones planned in another thread
+        cache.reduce(data['x'], accumulators.Moments)
+        seen = []
+        thread = threading.Thread(target=lambda: seen.append(len(cache._pending)))
+        thread.start()
+        thread.join()
+        self.assertEqual(seen, [0])
+        self.assertEqual(len(cache._pending), 1)
+        cache._pending = []
+
+    def test_reuse(self):
+        """A second profile of the same data only computes what changed"""
+        dask_profiling.base.clear_cache()
+        data = pd.DataFrame({'x': [1.5, 2, 2, 3, None], 'y': [1, 2, 3, 4, 5], 'c': ['a', 'b', 'b', 'c', 'd']})
+        results = describe(dd.from_pandas(data, npartitions=2))
+        # Same column name in another frame
+        other = describe(dd.from_pandas(data.assign(x=data.x * 2), npartitions=2))
+        self.assertEqual(other['variables'].loc['x']['max'], 6)
+        tasks = []
+        with dask.callbacks.Callback(pretask=lambda key, dsk, state: tasks.append(key)):
+            again = describe(dd.from_pandas(data, npartitions=2), bins=5)
+        self.assertTrue(all('summarize' in str(key) or 'merge_all' in str(key) or 'getitem' in str(key)
+                            for key in tasks))
+        self.assertEqual(again['variables'].loc['x']['mean'], results['variables'].loc['x']['mean'])
+
+    def test_partition_cache(self):
+        """Profiling again a dataset only reads the partitions which changed"""
+        test_dir = tempfile.mkdtemp()
+        try:
+            paths = [os.path.join(test_dir, 'part_%d.csv' % i) for i in range(4)]
+            for i, path in enumerate(paths):
+                pd.DataFrame({'x': np.arange(10) * (i + 1.5), 'c': list('aabbbccdde'),
+                              'd': pd.date_range('2000', periods=10, freq='D') + pd.Timedelta(days=10 * i)}
+                             ).to_csv(path, index=False)
+            cache_dir = os.path.join(test_dir, 'cache')
+
+            def profile():
+                dask_profiling.base.clear_cache()
+                df = dd.read_csv(paths, blocksize=None, parse_dates=['d'])
+                cache = dask_profiling.base.PartitionCache(cache_dir, dask_profiling.base.file_partition_ids(paths))
+                tasks = []
+                with dask.callbacks.Callback(pretask=lambda key, dsk, state: tasks.append(key)):
+                    results = describe(df, partition_cache=cache)
+                return results, len([key for key in tasks if 'summarize' in str(key)])
+
+            _, n_summaries = profile()
+            self.assertEqual(profile()[1], 0)
+            pd.DataFrame({'x': np.arange(10) * -2.0, 'c': list('aabbbccdde'),
+                          'd': pd.date_range('1990', periods=10, freq='D')}).to_csv(paths[1], index=False)
+            os.utime(paths[1], ns=(0, 0))
+            results, n_changed = profile()
+            # Only the partition which changed is read, even though the extrema and the mean changed
+            self.assertEqual(n_changed, n_summaries / len(paths))
+            dask_profiling.base.clear_cache()
+            # The percentiles are estimated from the same sketch
+            expected = describe(dd.read_csv(paths, blocksize=None, parse_dates=['d']), quantile_sketch=True)
+            for key in ['min', 'max', 'mean', 'std', 'distinct_count', '50%', 'mad']:
+                self.assertAlmostEqual(results['variables'].loc['x'][key], expected['variables'].loc['x'][key])
+            self.assertEqual(results['variables'].loc['d']['min'], pd.Timestamp('1990'))
+            self.assertEqual(results['variables'].loc['c']['freq'], expected['variables'].loc['c']['freq'])
+        finally:
+            shutil.rmtree(test_dir)
+
+class ProfileStateTest(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.data = pd.DataFrame({'x': random.randn(100), 'i': random.randint(0, 50, 100),
+                                  'c': random.choice(list('abcdef'), 100),
+                                  'd': pd.Timestamp('2000') + pd.to_timedelta(random.randint(0, 1000, 100), unit='D')})
+
+    def test_update(self):
+        """Updating the state with new data gives the profile of all the data"""
+        state = ProfileState.from_dataframe(dd.from_pandas(self.data[:60], npartitions=3))
+        state.update(dd.from_pandas(self.data[60:].reset_index(drop=True), npartitions=2))
+        state = pickle.loads(pickle.dumps(state))
+        results = state.describe()
+        expected = describe(dd.from_pandas(self.data, npartitions=4), quantile_sketch=True)
+        for col in self.data.columns:
+            for key in ['type', 'count', 'distinct_count', 'mean', 'std', 'min', 'max', '5%', '50%', 'mad', 'top']:
+                if key in expected['variables'].columns and not pd.isnull(expected['variables'].loc[col][key]):
+                    self.assertAlmostEqual(results['variables'].loc[col][key], expected['variables'].loc[col][key])
+        self.assertEqual(results['table']['n'], 100)
+        self.assertEqual(results['table']['n_duplicates'], expected['table']['n_duplicates'])
+        np.testing.assert_allclose(results['correlations']['pearson'], expected['correlations']['pearson'])
+
+    def test_report_update(self):
+        report = dask_profiling.ProfileReport(dd.from_pandas(self.data[:60], npartitions=3), incremental=True)
+        report.update(dd.from_pandas(self.data[60:].reset_index(drop=True), npartitions=2))
+        self.assertEqual(report.get_description()['table']['n'], 100)
+        self.assertLess(1000, len(report.to_html()))
+        with self.assertRaises(ValueError):
+            dask_profiling.ProfileReport(dd.from_pandas(self.data, npartitions=2)).update(self.data)
+        for option in [{'sample_fraction': 0.5}, {'time_budget': 1}, {'spearman': True}]:
+            self.assertRaises(ValueError, dask_profiling.ProfileReport, dd.from_pandas(self.data, npartitions=2),
+                              incremental=True, **option)
+
+class SamplingTest(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.data = pd.DataFrame({'x': random.randn(10000), 'c': random.choice(list('abc'), 10000)})
+        self.data.loc[random.rand(10000) < 0.2, 'x'] = np.nan
+        self.df = dd.from_pandas(self.data, npartitions=10)
+
+    def test_sample_partitions(self):
+        sample = dask_profiling.base.sample_partitions(self.df, sample_fraction=0.3, max_rows=600, random_state=0)
+        self.assertEqual(sample.npartitions, 3)
+        self.assertEqual(len(sample.compute()), 600)
+        pd.testing.assert_frame_equal(sample.compute(), dask_profiling.base.sample_partitions(
+            self.df, sample_fraction=0.3, max_rows=600, random_state=0).compute())
+        with self.assertRaises(ValueError):
+            dask_profiling.base.sample_partitions(self.df, sample_fraction=0)
+
+    def test_confidence_intervals(self):
+        """The intervals of the sample hold the statistics of the whole data"""
+        results = describe(self.df, sample_fraction=0.5, max_rows=2000, random_state=0)
+        self.assertTrue(results['table']['sampled'])
+        self.assertEqual(results['table']['n'], 2000)
+        expected = describe(self.df)
+        self.assertFalse(expected['table']['sampled'])
+        for col, key in [('x', 'p_missing'), ('x', 'p_zeros'), ('x', 'mean'), ('x', 'std'), ('c', 'p_missing')]:
+            stats = results['variables'].loc[col]
+            self.assertLessEqual(stats[key + '_lower'], stats[key])
+            self.assertLessEqual(stats[key], stats[key + '_upper'])
+            self.assertLessEqual(stats[key + '_lower'], expected['variables'].loc[col][key])
+            self.assertLessEqual(expected['variables'].loc[col][key], stats[key + '_upper'])
+        self.assertNotIn('mean_lower', expected['variables'].columns)
+
+    def test_time_budget(self):
+        """The first batch of partitions is always summarized, then until the budget runs out"""
+        results = describe(self.df, time_budget=0, pool_size=2, random_state=0)
+        self.assertEqual(results['table']['coverage'], 0.2)
+        self.assertEqual(results['table']['n'], 2000)
+        self.assertTrue(results['table']['sampled'])
+        self.assertIn('Data covered', to_html(self.data.head(), results))
+        dask_profiling.base.STATS_CACHE.clear()
+        computes = []
+        with dask.callbacks.Callback(start=lambda dsk: computes.append(len(dsk))):
+            results = describe(self.df, time_budget=600, pool_size=3)
+        # The types are sniffed once, then a single pass per batch of 3 partitions
+        self.assertEqual(len(computes), 1 + 4)
+        self.assertEqual(results['table']['coverage'], 1.0)
+        self.assertEqual(results['table']['n'], 10000)
+        self.assertFalse(results['table']['sampled'])
+        self.assertAlmostEqual(results['variables'].loc['x']['mean'], self.data['x'].mean())
+        for option in [{'spearman': True}, {'kendall_rows': 100}, {'cramers_v': True}, {'check_recoded': True}]:
+            self.assertRaises(ValueError, describe, self.df, time_budget=600, **option)
+
+
+@unittest.skipIf(pa is None, "pyarrow is not installed")
+class ParquetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        random = np.random.RandomState(0)
+        self.data = pd.DataFrame({'x': random.randn(100), 'i': random.randint(0, 50, 100),
+                                  'c': random.choice(list('abcdef'), 100),
+                                  'd': pd.Timestamp('2000') + pd.to_timedelta(random.randint(0, 1000, 100), unit='D')})
+        self.data.loc[::7, 'x'] = np.nan
+        for i in range(2):
+            part = self.data[i * 50:(i + 1) * 50]
+            # No statistics for 'i' in the second file
+            pq.write_table(pa.Table.from_pandas(part, preserve_index=False),
+                                   os.path.join(self.test_dir, 'part.{}.parquet'.format(i)), row_group_size=20,
+                                   write_statistics=True if i == 0 else ['x', 'c', 'd'])
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_footer_statistics(self):
+        n, footers = parquet.footer_statistics(self.test_dir)
+        self.assertEqual(n, 100)
+        self.assertEqual(footers.at['x', 'n_missing'], self.data['x'].isnull().sum())
+        self.assertEqual(footers.at['x', 'min'], self.data['x'].min())
+        self.assertEqual(footers.at['d', 'max'], self.data['d'].max())
+        self.assertTrue(pd.isnull(footers.at['i', 'n_missing']))
+        self.assertTrue(pd.isnull(footers.at['c', 'min']))
+
+    def test_overview(self):
+        """Only the variables without complete statistics are read"""
+        df = dd.read_parquet(self.test_dir)
+        dask_profiling.base.clear_cache()
+        overview = parquet.overview(df, self.test_dir)
+        # The counts and extrema of 'i' only
+        scanned = [type(value) for value in dask_profiling.base.STATS_CACHE._data.values()]
+        self.assertEqual(sorted(cls.__name__ for cls in scanned), ['Counts', 'Extremes'])
+        self.assertEqual(overview['table']['n'], 100)
+        variables = overview['variables']
+        self.assertEqual(variables.loc['x']['n_missing'], self.data['x'].isnull().sum())
+        self.assertEqual(variables.loc['i']['min'], self.data['i'].min())
+        self.assertEqual(variables.loc['d']['range'], self.data['d'].max() - self.data['d'].min())
+
+    def test_describe(self):
+        df = dd.read_parquet(self.test_dir)
+        results = describe(df, parquet_path=self.test_dir)
+        expected = describe(dd.from_pandas(self.data, npartitions=2))
+        for col in ['x', 'i', 'd']:
+            self.assertEqual(results['variables'].loc[col]['max'], expected['variables'].loc[col]['max'])
+            self.assertEqual(results['variables'].loc[col]['histogram'], expected['variables'].loc[col]['histogram'])
+
+
+class AccumulatorsTest(unittest.TestCase):
+
+    def test_moments_partitioning(self):
+        """The merged moments do not depend on the partitioning"""
+        data = pd.Series([50, 50, -10, 0, 0, 5, 15, -3, None, 2.5, 7, np.nan, 0, 1e3])
+        for npartitions in [1, 2, 3, 7]:
+            moments = accumulators.reduce_partitions(dd.from_pandas(data, npartitions=npartitions),
+                                                     accumulators.Moments).compute()
+            self.assertEqual(moments.size, len(data))
+            self.assertEqual(moments.n, data.count())
+            self.assertEqual(moments.n_zeros, 3)
+            self.assertAlmostEqual(moments.mean, data.mean(), 7)
+            self.assertAlmostEqual(moments.variance, data.var(), 7)
+            self.assertAlmostEqual(moments.skewness, data.skew(), 7)
+            self.assertAlmostEqual(moments.kurtosis, data.kurt(), 7)
+            self.assertEqual(moments.minimum, data.min())
+            self.assertEqual(moments.maximum, data.max())
+
+    def test_moments_infinite(self):
+        """The mean of infinite values is the one of pandas"""
+        for values in ([1, np.inf, 2, np.inf, 3, 4], [1, np.inf, 2, -np.inf, 3, 4]):
+            data = pd.Series(values)
+            moments = accumulators.reduce_partitions(dd.from_pandas(data, npartitions=3),
+                                                     accumulators.Moments).compute()
+            np.testing.assert_equal(moments.mean, data.mean())
+            self.assertEqual(moments.n_infinite, 2)
+
+    def test_histogram_infinite(self):
+        """The histogram spans the finite values, the infinite ones are left out"""
+        data = pd.DataFrame({'x': list(range(1, 11)) * 3 + [np.inf]})
+        hist = describe_1d(dd.from_pandas(data['x'], npartitions=3))['histogram']
+        self.assertEqual(hist.counts.sum(), 30)
+        self.assertEqual((hist.edges[0], hist.edges[-1]), (1, 10))
+        state = ProfileState.from_dataframe(dd.from_pandas(data, npartitions=3))
+        hist = dask_profiling.describe.derive_1d(state.summaries['x'], **state.options)['numeric']['histogram']
+        self.assertEqual(hist.counts.sum(), 30)
+        self.assertEqual((hist.edges[0], hist.edges[-1]), (1, 10))
+
+    def test_histogram_partitioning(self):
+        """The merged bin counts are the ones of the whole data"""
+        data = pd.Series([50, 50, -10, 0, 0, 5, 15, -3, None, 2.5, 7, np.nan, 0, 1e3])
+        expected, expected_edges = np.histogram(data.dropna(), bins=7)
+        for npartitions in [1, 3, 7]:
+            edges = accumulators.histogram_edges(data.min(), data.max(), 7)
+            hist = accumulators.reduce_partitions(dd.from_pandas(data, npartitions=npartitions),
+                                                  accumulators.Histogram, edges=edges).compute()
+            np.testing.assert_array_equal(hist.counts, expected)
+            np.testing.assert_allclose(hist.edges, expected_edges)
+            self.assertFalse(hist.is_date)
+
+    def test_tdigest(self):
+        """The quantile sketch is exact on small data and accurate on large data"""
+        percentiles = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+        data = pd.Series([50, 50, -10, 0, 0, 5, 15, -3, None])
+        digest = accumulators.reduce_partitions(dd.from_pandas(data, npartitions=3), accumulators.TDigest).compute()
+        np.testing.assert_allclose(digest.quantiles(percentiles), data.quantile(percentiles).values)
+
+        data = pd.Series(np.random.RandomState(0).lognormal(size=100000))
+        digest = accumulators.reduce_partitions(dd.from_pandas(data, npartitions=10), accumulators.TDigest,
+                                                compression=100).compute()
+        self.assertLessEqual(len(digest.means), 100)
+        ranks = np.searchsorted(np.sort(data.values), digest.quantiles(percentiles)) / len(data)
+        np.testing.assert_allclose(ranks, percentiles, atol=0.01)
+
+    def test_describe_quantile_sketch(self):
+        data = pd.Series([50, 50, -10, 0, 0, 5, 15, -3, None, 7, 1.5])
+        desc = describe_1d(dd.from_pandas(data, npartitions=3), quantile_sketch=True)
+        desc = dask.compute(desc)[0]
+        for percentile, key in zip([0.05, 0.25, 0.5, 0.75, 0.95], ['5%', '25%', '50%', '75%', '95%']):
+            self.assertAlmostEqual(desc[key], data.quantile(percentile), 7)
+        self.assertAlmostEqual(desc['iqr'], data.quantile(0.75) - data.quantile(0.25), 7)
+
+    def test_hyperloglog(self):
+        """The distinct count is exact for low cardinalities and close for high ones"""
+        data = pd.Series([1, 2, 2, np.nan, np.nan, 7, 1])
+        sketch = accumulators.reduce_partitions(dd.from_pandas(data, npartitions=3), accumulators.HyperLogLog).compute()
+        self.assertTrue(sketch.is_exact)
+        self.assertEqual(sketch.count(), 4)
+
+        data = pd.Series(np.random.RandomState(0).randint(0, 50000, size=200000))
+        sketch = accumulators.reduce_partitions(dd.from_pandas(data, npartitions=8), accumulators.HyperLogLog).compute()
+        self.assertFalse(sketch.is_exact)
+        self.assertLess(abs(sketch.count() - data.nunique()), 4 * sketch.relative_error * data.nunique())
+
+    def test_hyperloglog_mixed(self):
+        with self.assertRaises(TypeError):
+            accumulators.HyperLogLog.from_series(pd.Series([[1, 2], [1, 2]]))
+
+    def test_frequent_values(self):
+        """The heavy hitters are found with bounded errors and the extreme values are exact"""
+        data = pd.Series(np.random.RandomState(0).zipf(1.5, size=100000))
+        sketch = accumulators.reduce_partitions(dd.from_pandas(data, npartitions=8), accumulators.FrequentValues,
+                                                capacity=50).compute()
+        self.assertLessEqual(len(sketch.counts), 50)
+        value_counts = data.value_counts()
+        for value in value_counts.index[:10]:
+            self.assertLessEqual(value_counts[value], sketch.counts[value])
+            self.assertLessEqual(sketch.counts[value] - sketch.errors[value], value_counts[value])
+        frequencies = sketch.frequencies()
+        extremes = value_counts.sort_index()
+        for value in extremes.index[:5].append(extremes.index[-5:]):
+            self.assertEqual(frequencies[value], value_counts[value])
+
+    def test_row_groups(self):
+        """Only the one-to-one mappings are found, whatever the partitioning"""
+        data = pd.DataFrame({'x': list('aabbccdd') * 3, 'y': list('ABBCCDDA') * 3, 'z': list('eeffgghh') * 3,
+                             'w': [1, 1, 2, 2, None, None, 3, 3] * 3})
+        groups = accumulators.reduce_partitions(dd.from_pandas(data, npartitions=5), accumulators.RowGroups).compute()
+        self.assertEqual(groups.recoded(), {'x': 'w', 'z': 'w'})
+        self.assertEqual(groups.recoded(['x', 'y', 'z']), {'x': 'z'})
+        self.assertEqual(groups.recoded(overrides=['x']), {'z': 'w'})
+        groups = accumulators.reduce_partitions(dd.from_pandas(data, npartitions=5), accumulators.RowGroups,
+                                                max_groups=3).compute()
+        self.assertEqual(groups.recoded(), {})
+
+    def test_describe_top_k(self):
+        data = pd.DataFrame({'x': ['a'] * 5 + ['b'] * 3 + ['c', 'd', 'e', None], 'y': range(12)})
+        results = describe(dd.from_pandas(data, npartitions=3), top_k=2)
+        self.assertEqual(results['variables'].loc['x']['top'], 'a')
+        self.assertEqual(results['variables'].loc['x']['freq'], 5)
+        self.assertEqual(results['freq']['x'].index[0], 'a')
+        self.assertLess(1000, len(to_html(data.head(), results)))
+
+
+class ImportTest(unittest.TestCase):
+
+    def test_import_time(self):
+        """The heavy dependencies are imported on first use, the package is quick to import"""
+        # Only the modules added by the package count, dask may load some of them already
+        code = ("import sys, time; start = time.time(); import dask.dataframe; print(time.time() - start); "
+                "before = set(sys.modules); start = time.time(); import dask_profiling; print(time.time() - start); "
+                "print(' '.join(set(sys.modules) - before))")
+        baseline, elapsed, modules = subprocess.check_output([sys.executable, '-c', code],
+                                                             universal_newlines=True).splitlines()
+        for module in ('matplotlib', 'scipy.stats', 'jinja2', 'pkg_resources', 'pyarrow'):
+            self.assertFalse([name for name in modules.split() if name == module or name.startswith(module + '.')],
+                             module)
+        # Measured against dask in the same process, importing the heavy dependencies takes about as long
+        self.assertLess(float(elapsed), float(baseline) / 2)
+
+    def test_template_accessors(self):
+        """The Jinja environment and the row templates are still module attributes, created on first use"""
+        templates = dask_profiling.templates
+        self.assertEqual(set(templates.row_templates_dict), set(templates.row_templates))
+        self.assertIs(templates.row_templates_dict['NUM'], templates.template('row_num'))
+        self.assertIs(templates.jinja2_env.get_template('base.html'), templates.environment().get_template('base.html'))
+        self.assertEqual(templates.pl.package_name, 'dask_profiling')
 
 if __name__ == '__main__':
     unittest.main()